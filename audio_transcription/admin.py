@@ -10,7 +10,7 @@ class AudioFileAdmin(admin.ModelAdmin):
 
 @admin.register(Transcription)
 class TranscriptionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'audio_file', 'completed_at')
-    list_filter = ('completed_at',)
+    list_display = ('id', 'audio_file', 'status', 'model_size', 'completed_at')
+    list_filter = ('status', 'completed_at')
     search_fields = ('id', 'audio_file__id')
     readonly_fields = ('completed_at',)
\ No newline at end of file
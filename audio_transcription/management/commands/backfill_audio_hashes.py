@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from audio_transcription.models import AudioFile, content_sha256
+
+
+class Command(BaseCommand):
+    help = 'Compute content hashes for audio files uploaded before deduplication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of rows to update per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = []
+        updated = 0
+        missing = 0
+
+        for audio_file in AudioFile.objects.filter(content_sha256__isnull=True).only('id', 'file').iterator():
+            if not audio_file.file or not audio_file.file.storage.exists(audio_file.file.name):
+                missing += 1
+                continue
+
+            with audio_file.file.open('rb') as f:
+                audio_file.content_sha256 = content_sha256(f)
+            pending.append(audio_file)
+
+            if len(pending) >= batch_size:
+                AudioFile.objects.bulk_update(pending, ['content_sha256'])
+                updated += len(pending)
+                pending = []
+
+        if pending:
+            AudioFile.objects.bulk_update(pending, ['content_sha256'])
+            updated += len(pending)
+
+        self.stdout.write(self.style.SUCCESS(f'Hashed {updated} audio files'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'Skipped {missing} rows with no file on disk'))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand, CommandError
-from audio_transcription.services.transcription_service import TranscriptionService
+from audio_transcription.services.transcription_service import TranscriptionService, WHISPER_MODEL_SIZES
 import json
 
 
@@ -9,7 +9,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('audio_file', type=str, help='Path to the audio file to transcribe')
         parser.add_argument('--model', type=str, default='base', 
-                            choices=['tiny', 'base', 'small', 'medium', 'large'],
+                            choices=WHISPER_MODEL_SIZES,
                             help='Whisper model size to use')
         parser.add_argument('--output', type=str, help='Output file path for JSON result')
 
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_transcription', '0001_initial'),
+    ]
+
+    operations = [
+        # Rows created before the job queue were processed synchronously
+        migrations.AddField(
+            model_name='transcription',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='transcription',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='transcription',
+            name='json_result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transcription',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
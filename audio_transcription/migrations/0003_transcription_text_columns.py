@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce
+
+
+def backfill_text_columns(apps, schema_editor):
+    """Copy text and language out of json_result in a single UPDATE"""
+    Transcription = apps.get_model('audio_transcription', 'Transcription')
+    Transcription.objects.filter(json_result__isnull=False).update(
+        text=Coalesce(KeyTextTransform('text', 'json_result'), Value('')),
+        language=Coalesce(KeyTextTransform('language', 'json_result'), Value(''))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_transcription', '0002_transcription_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcription',
+            name='text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='language',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_text_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-14 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_transcription', '0003_transcription_text_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_transcription', '0004_audiofile_content_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcription',
+            name='model_size',
+            field=models.CharField(default='base', max_length=16),
+        ),
+    ]
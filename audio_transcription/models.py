@@ -1,7 +1,9 @@
 from django.db import models
+from django.core.files import File
 from django.utils import timezone
 import os
 import uuid
+import hashlib
 
 def audio_file_path(instance, filename):
     """Generate file path for new audio file"""
@@ -9,20 +11,59 @@ def audio_file_path(instance, filename):
     filename = f"{uuid.uuid4()}.{ext}"
     return os.path.join('uploads/audio/', filename)
 
+class HashingFile(File):
+    """Wrap an upload so storage hashes each chunk as it writes it"""
+    
+    def __init__(self, file):
+        super().__init__(file, name=file.name)
+        self._digest = hashlib.sha256()
+    
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self._digest.update(chunk)
+            yield chunk
+    
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+def content_sha256(file):
+    """Hash a Django file chunk by chunk so large uploads stay out of memory"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
 class AudioFile(models.Model):
     """Model to store audio files for transcription"""
     file = models.FileField(upload_to=audio_file_path)
     uploaded_at = models.DateTimeField(default=timezone.now)
     processed = models.BooleanField(default=False)
+    # Identical uploads share a transcription; null for rows that predate hashing
+    content_sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     
     def __str__(self):
         return f"Audio file {self.id} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
 
 class Transcription(models.Model):
     """Model to store transcription results"""
+    
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        PROCESSING = 'processing', 'Processing'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+    
     audio_file = models.OneToOneField(AudioFile, on_delete=models.CASCADE, related_name='transcription')
-    json_result = models.JSONField()
-    completed_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    # Whisper size that produced (or will produce) this result; part of the dedup key
+    model_size = models.CharField(max_length=16, default='base')
+    json_result = models.JSONField(null=True, blank=True)
+    # Hot fields copied out of json_result so list queries never parse segments
+    text = models.TextField(blank=True, default='')
+    language = models.CharField(max_length=16, blank=True, default='')
+    duration_seconds = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    completed_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return f"Transcription for audio {self.audio_file.id}"
\ No newline at end of file
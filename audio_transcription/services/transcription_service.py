@@ -1,169 +1,510 @@
 import os
 import json
+import pickle
+import hashlib
+import functools
+import subprocess
 import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+import numpy as np
+import soundfile
 import torch
-import whisper
+import torchaudio
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
 from pyannote.audio import Pipeline
-from pydub import AudioSegment
+from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Process-wide model cache so every service instance reuses resident weights
+_WHISPER_CACHE: dict = {}
+_DIAR_CACHE = {"pipeline": None, "loaded": False}
+_LOCK = threading.Lock()
+
+# Sample rate expected by both Whisper and pyannote
+SAMPLE_RATE = 16000
+
+# Whisper sizes clients may request; anything else would make faster-whisper
+# download (and the process cache) an arbitrary Hugging Face repo
+WHISPER_MODEL_SIZES = ('tiny', 'base', 'small', 'medium', 'large')
+
+# Number of VAD chunks decoded together by the batched Whisper pipeline
+WHISPER_BATCH_SIZE = 16
+
+# Silero VAD settings shared by Whisper and pyannote; speech is grouped into
+# chunks of at most one 30s Whisper window so they can be batched directly
+_VAD_OPTIONS = VadOptions(
+    min_speech_duration_ms=250,
+    max_speech_duration_s=30,
+    min_silence_duration_ms=160
+)
+
+# Containers torchaudio decodes natively; everything else goes through ffmpeg
+_PCM_FORMATS = {'WAV', 'FLAC'}
+
+
+@dataclass(eq=False)
+class DiarSegments:
+    """Diarization turns as parallel arrays; speakers index into labels"""
+    starts: np.ndarray
+    ends: np.ndarray
+    speakers: np.ndarray
+    labels: List[str]
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def to_list_of_dict(self):
+        """Expand into {start, end, speaker} dicts for serialization"""
+        return [{
+            'start': start,
+            'end': end,
+            'speaker': self.labels[speaker]
+        } for start, end, speaker in zip(self.starts.tolist(), self.ends.tolist(), self.speakers.tolist())]
+
+
+@functools.lru_cache(maxsize=128)
+def _read_diarization_cache(cache_path):
+    """Read cached diarization segments (raises FileNotFoundError on a miss, which isn't memoized)"""
+    with open(cache_path, 'rb') as f:
+        return pickle.load(f)
+
 class TranscriptionService:
     """Service for handling audio transcription with speaker diarization"""
     
     def __init__(self, model_size="base"):
         """Initialize the service with specified whisper model size"""
         self.model_size = model_size
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.whisper_model = None
         self.diarization_pipeline = None
         
     def _load_models(self):
-        """Load the required models (lazy loading to save resources)"""
-        if self.whisper_model is None:
-            logger.info(f"Loading Whisper model: {self.model_size}")
-            self.whisper_model = whisper.load_model(self.model_size)
-        
-        if self.diarization_pipeline is None:
-            logger.info("Loading diarization pipeline")
-            # In a production environment, you would need proper authentication
-            # with HuggingFace to use pyannote.audio
+        """Load the required models (lazy loading, shared across instances)"""
+        self._load_whisper_model()
+        self._load_diarization_pipeline()
+    
+    def _load_whisper_model(self):
+        """Load the Whisper model alone, for callers that don't diarize"""
+        with _LOCK:
+            if self.whisper_model is None:
+                # CTranslate2 backend with INT8 weights; keep FP16 activations on GPU
+                compute_type = "int8_float16" if self.device == "cuda" else "int8"
+                
+                key = (self.model_size, self.device)
+                if key not in _WHISPER_CACHE:
+                    logger.info(f"Loading Whisper model: {self.model_size} ({self.device})")
+                    model = WhisperModel(
+                        self.model_size,
+                        device=self.device,
+                        compute_type=compute_type
+                    )
+                    # Decode VAD chunks in parallel batches instead of 30s windows in sequence
+                    _WHISPER_CACHE[key] = BatchedInferencePipeline(model=model)
+                self.whisper_model = _WHISPER_CACHE[key]
+    
+    def _load_diarization_pipeline(self):
+        """Load the pyannote diarization pipeline"""
+        with _LOCK:
+            if self.diarization_pipeline is None:
+                if not _DIAR_CACHE["loaded"]:
+                    logger.info("Loading diarization pipeline")
+                    # In a production environment, you would need proper authentication
+                    # with HuggingFace to use pyannote.audio
+                    try:
+                        pipeline = Pipeline.from_pretrained(
+                            "pyannote/speaker-diarization-3.0",
+                            use_auth_token=os.getenv('HUGGINGFACE_TOKEN')
+                        )
+                        if pipeline is not None and self.device == "cuda":
+                            pipeline.to(torch.device("cuda"))
+                            self._half_precision(pipeline)
+                            self._compile_segmentation(pipeline)
+                        _DIAR_CACHE["pipeline"] = pipeline
+                    except Exception as e:
+                        logger.error(f"Error loading diarization model: {e}")
+                        # Fall back to a simple time-based diarization as fallback
+                        _DIAR_CACHE["pipeline"] = None
+                    _DIAR_CACHE["loaded"] = True
+                self.diarization_pipeline = _DIAR_CACHE["pipeline"]
+    
+    def _half_precision(self, pipeline):
+        """Cast pyannote's segmentation and embedding networks to 16-bit floats"""
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        
+        for name in ('_segmentation', '_embedding'):
             try:
-                self.diarization_pipeline = Pipeline.from_pretrained(
-                    "pyannote/speaker-diarization-3.0",
-                    use_auth_token=os.getenv('HUGGINGFACE_TOKEN')
-                )
+                # Inference wraps its network as .model, embedding wrappers as .model_;
+                # ONNX-based embeddings have no torch network and are skipped
+                inference = getattr(pipeline, name)
+                model = getattr(inference, 'model', None) or inference.model_
+                model.to(dtype)
+                
+                # Callers keep passing float32 audio (and, for embeddings, float32
+                # weights=masks) and expect float32 outputs
+                cast = lambda a: a.to(dtype) if torch.is_tensor(a) and a.is_floating_point() else a
+                forward = model.forward
+                model.forward = lambda *args, forward=forward, **kwargs: forward(
+                    *(cast(a) for a in args),
+                    **{key: cast(value) for key, value in kwargs.items()}
+                ).float()
             except Exception as e:
-                logger.error(f"Error loading diarization model: {e}")
-                # Fall back to a simple time-based diarization as fallback
-                self.diarization_pipeline = None
+                logger.warning(f"Keeping {name} in float32: {e}")
+    
+    def _compile_segmentation(self, pipeline):
+        """Compile pyannote's segmentation model, which always runs on fixed-size chunks"""
+        # Default mode, not reduce-overhead: the first call runs while CTranslate2
+        # decodes and allocates on the same GPU in another thread, which is unsafe
+        # during torch 2.0's global-mode CUDA graph capture, and a failed capture
+        # would surface as the fake-speaker fallback in _perform_diarization
+        try:
+            from darwix_ai_project.compilation import compile_forward
+            
+            compile_forward(pipeline._segmentation.model)
+        except Exception as e:
+            logger.warning(f"Could not compile segmentation model, using eager mode: {e}")
     
     def _convert_audio_format(self, audio_path, output_path=None):
         """Convert audio to appropriate format for processing"""
         if output_path is None:
-            output_path = tempfile.mktemp(suffix='.wav')
+            with tempfile.NamedTemporaryFile(suffix='.wav', dir=settings.TEMP_DIR, delete=False) as temp_file:
+                output_path = temp_file.name
         
-        # Convert to WAV format with appropriate parameters for diarization
-        audio = AudioSegment.from_file(audio_path)
-        audio = audio.set_channels(1)  # Mono
-        audio = audio.set_frame_rate(16000)  # 16kHz
-        audio.export(output_path, format='wav')
+        # Stream decode -> mono -> 16kHz -> PCM16 WAV in ffmpeg, without holding PCM in Python
+        try:
+            subprocess.run([
+                "ffmpeg", "-nostdin",
+                "-i", audio_path,
+                "-ac", "1",
+                "-ar", str(SAMPLE_RATE),
+                "-f", "wav",
+                "-acodec", "pcm_s16le",
+                "-y", output_path
+            ], check=True, capture_output=True)
+        except Exception:
+            # Don't leave a partial WAV behind
+            Path(output_path).unlink(missing_ok=True)
+            raise
         
         return output_path
     
-    def _perform_diarization(self, audio_path):
-        """Perform speaker diarization on the audio file"""
+    def _load_waveform(self, audio_path):
+        """Decode audio into a mono 16kHz waveform tensor, resampling on GPU when available"""
+        waveform, sample_rate = torchaudio.load(audio_path)
+        waveform = waveform.to(self.device)
+        
+        # Downmix to mono and resample on the same device
+        waveform = waveform.mean(dim=0, keepdim=True)
+        if sample_rate != SAMPLE_RATE:
+            waveform = torchaudio.functional.resample(waveform, sample_rate, SAMPLE_RATE)
+        
+        return waveform
+    
+    def _audio_cache_key(self, audio_path):
+        """Identify an audio file cheaply by hashing its first MB and its size"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(audio_path, 'rb') as f:
+            digest.update(f.read(1 << 20))
+        digest.update(str(os.path.getsize(audio_path)).encode())
+        return digest.hexdigest()
+    
+    def _detect_speech(self, waveform):
+        """Find speech regions with Silero VAD, as start/end sample ranges"""
+        return get_speech_timestamps(waveform[0].cpu().numpy(), _VAD_OPTIONS, sampling_rate=SAMPLE_RATE)
+    
+    def _restore_speech_times(self, times, speech, side):
+        """Map times in spliced speech-only audio back onto the original timeline"""
+        starts = np.array([s['start'] for s in speech]) / SAMPLE_RATE
+        lengths = np.array([s['end'] - s['start'] for s in speech]) / SAMPLE_RATE
+        spliced_ends = np.cumsum(lengths)
+        
+        # Turn starts sitting on a boundary belong to the next chunk, turn ends to the previous
+        index = np.minimum(np.searchsorted(spliced_ends, times, side=side), len(speech) - 1)
+        return (times + (starts - (spliced_ends - lengths))[index]).astype(np.float32)
+    
+    def _perform_diarization(self, waveform, cache_key=None, speech=None):
+        """Perform speaker diarization on the audio waveform, restricted to speech if given"""
         try:
             if self.diarization_pipeline is None:
                 # Simplified diarization for demo purposes
-                return self._simple_diarization(audio_path)
+                return self._simple_diarization(waveform)
+            
+            # Reuse pyannote output from a previous run on the same audio
+            cache_path = None
+            if cache_key is not None:
+                cache_path = os.path.join(settings.DIAR_CACHE_DIR, f"{cache_key}.pkl")
+                try:
+                    return _read_diarization_cache(cache_path)
+                except FileNotFoundError:
+                    pass
             
-            # Real diarization with pyannote
-            diarization = self.diarization_pipeline(audio_path)
+            # Splice out silence so pyannote only processes speech
+            if speech is not None:
+                if not speech:
+                    return DiarSegments(
+                        starts=np.zeros(0, dtype=np.float32),
+                        ends=np.zeros(0, dtype=np.float32),
+                        speakers=np.zeros(0, dtype=np.int16),
+                        labels=[]
+                    )
+                audio = torch.cat([waveform[:, s['start']:s['end']] for s in speech], dim=1)
+            else:
+                audio = waveform
+            
+            # Real diarization with pyannote, fed the in-memory waveform
+            diarization = self.diarization_pipeline({
+                'waveform': audio,
+                'sample_rate': SAMPLE_RATE
+            })
             
-            # Convert diarization result to a list of segments
-            segments = []
+            # Collect turns into parallel arrays in a single pass
+            starts, ends, speakers = [], [], []
+            speaker_ids = {}
             for turn, _, speaker in diarization.itertracks(yield_label=True):
-                segments.append({
-                    'start': turn.start,
-                    'end': turn.end,
-                    'speaker': speaker
-                })
+                starts.append(turn.start)
+                ends.append(turn.end)
+                speakers.append(speaker_ids.setdefault(speaker, len(speaker_ids)))
+            
+            segments = DiarSegments(
+                starts=np.array(starts, dtype=np.float32),
+                ends=np.array(ends, dtype=np.float32),
+                speakers=np.array(speakers, dtype=np.int16),
+                labels=list(speaker_ids)
+            )
+            
+            if speech is not None:
+                segments.starts = self._restore_speech_times(segments.starts, speech, side='right')
+                segments.ends = self._restore_speech_times(segments.ends, speech, side='left')
+            
+            if cache_path is not None:
+                # Write then rename so concurrent readers never see a partial file
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(segments, f)
+                os.replace(tmp_path, cache_path)
             
             return segments
         except Exception as e:
             logger.error(f"Diarization error: {e}")
             # Fallback to simple diarization
-            return self._simple_diarization(audio_path)
+            return self._simple_diarization(waveform)
     
-    def _simple_diarization(self, audio_path):
+    def _simple_diarization(self, waveform):
         """Simple time-based diarization as fallback"""
         # This is a very simplified approach - in production you'd want proper diarization
-        audio = AudioSegment.from_file(audio_path)
-        duration_seconds = len(audio) / 1000
+        duration_seconds = waveform.shape[-1] / SAMPLE_RATE
         
         # Roughly divide the audio into segments, alternating between speakers
         segment_length = 10  # seconds per segment
-        segments = []
-        
-        for i in range(0, int(duration_seconds), segment_length):
-            speaker = f"SPEAKER_{1 if i % 20 < 10 else 2}"
-            end = min(i + segment_length, duration_seconds)
-            segments.append({
-                'start': i,
-                'end': end,
-                'speaker': speaker
-            })
+        starts = np.arange(0, int(duration_seconds), segment_length, dtype=np.float32)
         
-        return segments
+        return DiarSegments(
+            starts=starts,
+            ends=np.minimum(starts + segment_length, duration_seconds).astype(np.float32),
+            speakers=(starts % 20 >= 10).astype(np.int16),
+            labels=["SPEAKER_1", "SPEAKER_2"]
+        )
     
-    def _transcribe_audio(self, audio_path):
-        """Transcribe audio using Whisper"""
+    def _transcribe_audio(self, waveform, speech=None):
+        """Transcribe audio using Whisper, decoding only the given speech regions"""
+        # Nothing to decode; with no clip_timestamps the pipeline would run VAD again
+        if speech is not None and not speech:
+            return {
+                'segments': [],
+                'text': '',
+                'duration': waveform.shape[-1] / SAMPLE_RATE
+            }
+        
         try:
-            result = self.whisper_model.transcribe(audio_path)
-            return result
+            # Reuse precomputed VAD regions instead of letting the pipeline run VAD again
+            clip_timestamps = None
+            if speech:
+                clip_timestamps = merge_segments([dict(s) for s in speech], _VAD_OPTIONS)
+            
+            # faster-whisper takes a float32 mono 16kHz array and featurizes it itself;
+            # the batched pipeline decodes each speech chunk as one batch entry
+            segments, info = self.whisper_model.transcribe(
+                waveform[0].cpu().numpy(),
+                batch_size=WHISPER_BATCH_SIZE,
+                beam_size=1,
+                vad_filter=True,
+                vad_parameters=_VAD_OPTIONS,
+                clip_timestamps=clip_timestamps,
+                word_timestamps=False
+            )
+            
+            # faster-whisper yields segments lazily, decoding happens here
+            segments = [{
+                'start': s.start,
+                'end': s.end,
+                'text': s.text
+            } for s in segments]
+            
+            return {
+                'segments': segments,
+                'text': ''.join(s['text'] for s in segments).strip(),
+                'language': info.language,
+                'duration': info.duration
+            }
         except Exception as e:
             logger.error(f"Transcription error: {e}")
             raise
     
     def _merge_transcription_with_diarization(self, transcription, diarization):
         """Merge transcription with diarization information"""
-        merged_segments = []
-        
-        for segment in transcription['segments']:
-            # Find the speaker for this segment
-            start_time = segment['start']
-            end_time = segment['end']
-            
-            # Find overlapping diarization segments
-            overlapping_speakers = []
-            for diar_segment in diarization:
-                if (diar_segment['end'] > start_time and 
-                    diar_segment['start'] < end_time):
-                    overlapping_speakers.append(diar_segment['speaker'])
-            
-            # Use the most common speaker or "UNKNOWN" if none found
-            speaker = max(set(overlapping_speakers), key=overlapping_speakers.count) if overlapping_speakers else "UNKNOWN"
-            
-            merged_segments.append({
-                'start': start_time,
-                'end': end_time,
-                'text': segment['text'].strip(),
-                'speaker': speaker
-            })
+        segments = transcription['segments']
+        
+        speakers = ["UNKNOWN"] * len(segments)
+        if segments and len(diarization):
+            seg_start = np.array([s['start'] for s in segments], dtype=np.float32)[:, None]
+            seg_end = np.array([s['end'] for s in segments], dtype=np.float32)[:, None]
+            
+            # Overlap of every transcription segment with every diarization turn
+            overlap = np.maximum(0, np.minimum(seg_end, diarization.ends) - np.maximum(seg_start, diarization.starts))
+            
+            # Total overlap per speaker, then pick the speaker with the most
+            per_speaker = overlap @ np.eye(len(diarization.labels), dtype=np.float32)[diarization.speakers]
+            best = per_speaker.argmax(axis=1)
+            found = per_speaker.max(axis=1) > 0
+            speakers = [diarization.labels[b] if f else "UNKNOWN" for b, f in zip(best, found)]
+        
+        merged_segments = [{
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment['text'].strip(),
+            'speaker': speaker
+        } for segment, speaker in zip(segments, speakers)]
         
         return {
             'segments': merged_segments,
             'text': transcription['text'],
-            'language': transcription.get('language', 'en')
+            'language': transcription.get('language', 'en'),
+            'duration': transcription.get('duration')
         }
     
+    def _is_native_pcm(self, audio_path):
+        """Probe the file header to see if it can be decoded without ffmpeg"""
+        try:
+            info = soundfile.info(audio_path)
+        except Exception:
+            return False
+        return info.format in _PCM_FORMATS
+    
+    def _decode_audio(self, audio_file_path):
+        """Decode an audio file into a mono 16kHz waveform, converting it first if needed"""
+        # Read WAV/FLAC in place (already-16kHz mono files skip resampling entirely);
+        # the caller's file is never deleted, only our converted copy
+        if self._is_native_pcm(audio_file_path):
+            return self._load_waveform(audio_file_path)
+        
+        processed_audio_path = self._convert_audio_format(audio_file_path)
+        try:
+            return self._load_waveform(processed_audio_path)
+        finally:
+            # Clean up the converted copy
+            Path(processed_audio_path).unlink(missing_ok=True)
+    
     def process_audio(self, audio_file_path):
         """Process audio file for transcription with diarization"""
         # Load models if not already loaded
         self._load_models()
         
-        # Convert audio to appropriate format
-        processed_audio_path = self._convert_audio_format(audio_file_path)
+        # Key the diarization cache on the original upload, not the converted copy
+        cache_key = self._audio_cache_key(audio_file_path)
         
         try:
-            # Perform transcription
-            transcription = self._transcribe_audio(processed_audio_path)
+            # Decode once and share the waveform between both models
+            waveform = self._decode_audio(audio_file_path)
             
-            # Perform diarization
-            diarization = self._perform_diarization(processed_audio_path)
-            
-            # Merge results
-            result = self._merge_transcription_with_diarization(transcription, diarization)
+            # Find speech once so neither model spends time on silence
+            speech = self._detect_speech(waveform)
             
-            # Clean up
-            if os.path.exists(processed_audio_path) and processed_audio_path != audio_file_path:
-                os.remove(processed_audio_path)
+            # Transcription and diarization are independent, so run them concurrently;
+            # both backends release the GIL while their kernels run
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                transcription_future = executor.submit(self._transcribe_audio, waveform, speech=speech)
+                diarization_future = executor.submit(
+                    self._perform_diarization, waveform, cache_key=cache_key, speech=speech
+                )
+                transcription = transcription_future.result()
+                diarization = diarization_future.result()
             
-            return result
+            # Merge results
+            return self._merge_transcription_with_diarization(transcription, diarization)
         except Exception as e:
             logger.error(f"Error processing audio: {e}")
-            # Clean up on error
-            if os.path.exists(processed_audio_path) and processed_audio_path != audio_file_path:
-                os.remove(processed_audio_path)
-            raise
\ No newline at end of file
+            raise
+    
+    def _transcribe_words(self, audio, start, end):
+        """Transcribe audio[start:end] into words with absolute timestamps"""
+        offset = start / SAMPLE_RATE
+        # The sequential model suits short, growing buffers better than VAD batching
+        segments, _ = self.whisper_model.model.transcribe(
+            audio[start:end],
+            beam_size=1,
+            word_timestamps=True,
+            condition_on_previous_text=False
+        )
+        return [{
+            'start': offset + word.start,
+            'end': offset + word.end,
+            'text': word.word.strip()
+        } for segment in segments for word in segment.words]
+    
+    def process_audio_stream(self, audio_file_path, chunk_seconds=5, max_buffer_seconds=30):
+        """Transcribe audio incrementally, yielding words as soon as they are stable
+        
+        Uses LocalAgreement-2: the buffer grows by chunk_seconds per round, words on
+        which two consecutive rounds agree are emitted, and the audio they cover is
+        trimmed from the buffer. Rounds without words trim all but the buffer's last
+        second, and
+        once it reaches max_buffer_seconds the current hypothesis is committed, so
+        each round decodes a bounded window.
+        """
+        # Streaming never diarizes, so web workers don't load pyannote
+        self._load_whisper_model()
+        audio = self._decode_audio(audio_file_path)[0].cpu().numpy()
+        
+        step = int(chunk_seconds * SAMPLE_RATE)
+        max_buffer = int(max_buffer_seconds * SAMPLE_RATE)
+        buffer_start = 0
+        buffer_end = 0
+        previous = deque()
+        
+        while buffer_end < len(audio):
+            buffer_end = min(buffer_end + step, len(audio))
+            current = deque(self._transcribe_words(audio, buffer_start, buffer_end))
+            heard = bool(current)
+            
+            # Emit the common prefix of this round's and the last round's hypothesis
+            committed = None
+            while previous and current and previous[0]['text'].lower() == current[0]['text'].lower():
+                previous.popleft()
+                committed = current.popleft()
+                yield committed
+            
+            if not heard:
+                # The whole buffer decoded to silence or music; don't decode it again,
+                # except for its last second, which may hold a word cut at the edge
+                buffer_start = max(buffer_start, buffer_end - SAMPLE_RATE)
+            elif buffer_end - buffer_start >= max_buffer:
+                # Rounds keep disagreeing; accept this hypothesis rather than
+                # re-decoding an ever-growing buffer
+                yield from current
+                committed = current[-1]
+                current = deque()
+            
+            # Re-decode only from the end of the last emitted word
+            if committed is not None:
+                buffer_start = max(buffer_start, int(committed['end'] * SAMPLE_RATE))
+            previous = current
+        
+        # No further round to agree with; the last hypothesis is final
+        yield from previous
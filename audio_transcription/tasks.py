@@ -0,0 +1,41 @@
+from celery import shared_task
+from django.utils import timezone
+import logging
+
+from .models import Transcription
+from .services.transcription_service import TranscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def transcribe_task(audio_file_id, model_size='base'):
+    """Transcribe a queued audio file with diarization and store the result"""
+    transcription = Transcription.objects.select_related('audio_file').get(audio_file_id=audio_file_id)
+    audio_file = transcription.audio_file
+    
+    transcription.status = Transcription.Status.PROCESSING
+    transcription.save(update_fields=['status'])
+    
+    try:
+        transcription_service = TranscriptionService(model_size=model_size)
+        result = transcription_service.process_audio(audio_file.file.path)
+    except Exception as e:
+        logger.error(f"Error in transcription process: {str(e)}")
+        transcription.status = Transcription.Status.FAILED
+        transcription.error = str(e)
+        transcription.save(update_fields=['status', 'error'])
+        return
+    
+    transcription.json_result = result
+    transcription.text = result['text']
+    transcription.language = result.get('language', '')
+    transcription.duration_seconds = result.get('duration')
+    transcription.status = Transcription.Status.COMPLETED
+    transcription.completed_at = timezone.now()
+    transcription.save(update_fields=[
+        'json_result', 'text', 'language', 'duration_seconds', 'status', 'completed_at'
+    ])
+    
+    audio_file.processed = True
+    audio_file.save(update_fields=['processed'])
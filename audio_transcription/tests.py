@@ -1,12 +1,19 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 import os
 import json
+import tempfile
+import numpy as np
+import soundfile
+import torch
 from unittest.mock import patch, MagicMock
 
 from .models import AudioFile, Transcription
-from .services.transcription_service import TranscriptionService
+from .services import transcription_service
+from .services.transcription_service import DiarSegments, TranscriptionService
+from .tasks import transcribe_task
 
 
 class AudioTranscriptionModelTests(TestCase):
@@ -32,31 +39,34 @@ class AudioTranscriptionModelTests(TestCase):
 class TranscriptionServiceTests(TestCase):
     """Test cases for the transcription service"""
     
-    @patch('audio_transcription.services.transcription_service.whisper')
+    def setUp(self):
+        """Reset the process-wide model cache between tests"""
+        transcription_service._WHISPER_CACHE.clear()
+        transcription_service._DIAR_CACHE.update(pipeline=None, loaded=False)
+    
+    @patch('audio_transcription.services.transcription_service.get_speech_timestamps')
+    @patch('audio_transcription.services.transcription_service.torchaudio')
+    @patch('audio_transcription.services.transcription_service.BatchedInferencePipeline')
+    @patch('audio_transcription.services.transcription_service.WhisperModel')
     @patch('audio_transcription.services.transcription_service.Pipeline')
-    @patch('audio_transcription.services.transcription_service.AudioSegment')
-    def test_process_audio(self, mock_audio_segment, mock_pipeline, mock_whisper):
+    @patch('audio_transcription.services.transcription_service.subprocess')
+    def test_process_audio(self, mock_subprocess, mock_pipeline, mock_whisper_model,
+                           mock_batched_pipeline, mock_torchaudio, mock_vad):
         """Test the process_audio method of TranscriptionService"""
-        # Mock the whisper model and transcription result
+        # Mock the batched whisper pipeline and transcription result
         mock_model = MagicMock()
-        mock_whisper.load_model.return_value = mock_model
-        mock_model.transcribe.return_value = {
-            'text': 'This is a test transcription.',
-            'segments': [
-                {'start': 0.0, 'end': 2.0, 'text': 'This is a test'}
-            ]
-        }
+        mock_batched_pipeline.return_value = mock_model
+        mock_segment = MagicMock(start=0.0, end=2.0, text=' This is a test transcription.')
+        mock_model.transcribe.return_value = ([mock_segment], MagicMock(language='en'))
         
         # Mock the diarization pipeline
         mock_diarization = MagicMock()
         mock_pipeline.from_pretrained.return_value = mock_diarization
         mock_diarization.return_value = MagicMock()
         
-        # Create a simple mock for AudioSegment
-        mock_audio = MagicMock()
-        mock_audio_segment.from_file.return_value = mock_audio
-        mock_audio.set_channels.return_value = mock_audio
-        mock_audio.set_frame_rate.return_value = mock_audio
+        # Mock decoding of the converted WAV and the speech it contains
+        mock_torchaudio.load.return_value = (torch.zeros(1, 32000), 16000)
+        mock_vad.return_value = [{'start': 0, 'end': 32000}]
         
         # Create an instance of the service and process a file
         service = TranscriptionService(model_size='base')
@@ -65,57 +75,440 @@ class TranscriptionServiceTests(TestCase):
         test_file_path = 'test_audio.mp3'
         
         # Process the audio
-        with patch('os.path.exists', return_value=True):
-            with patch('os.remove'):
-                result = service.process_audio(test_file_path)
+        with patch.object(TranscriptionService, '_audio_cache_key', return_value=None):
+            result = service.process_audio(test_file_path)
         
         # Assert expected calls and results
-        mock_whisper.load_model.assert_called_once_with('base')
+        mock_whisper_model.assert_called_once()
+        self.assertEqual(mock_whisper_model.call_args[0][0], 'base')
         mock_model.transcribe.assert_called_once()
+        self.assertEqual(mock_model.transcribe.call_args[1]['clip_timestamps'][0]['end'], 32000)
+        mock_subprocess.run.assert_called_once()
+        self.assertEqual(mock_subprocess.run.call_args[0][0][0], 'ffmpeg')
         
         # Check the result structure
         self.assertIn('text', result)
         self.assertIn('segments', result)
         self.assertEqual(result['text'], 'This is a test transcription.')
+    
+    @patch('audio_transcription.services.transcription_service.subprocess')
+    def test_decode_audio_skips_conversion_for_wav(self, mock_subprocess):
+        """Test that a 16kHz mono WAV is read in place without ffmpeg"""
+        service = TranscriptionService()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_path = os.path.join(tmp_dir, 'clip.wav')
+            soundfile.write(wav_path, np.zeros(16000, dtype=np.float32), 16000, subtype='PCM_16')
+            
+            waveform = service._decode_audio(wav_path)
+            
+            self.assertTrue(os.path.exists(wav_path))
+        
+        mock_subprocess.run.assert_not_called()
+        self.assertEqual(tuple(waveform.shape), (1, 16000))
+    
+    @patch('audio_transcription.services.transcription_service.BatchedInferencePipeline')
+    @patch('audio_transcription.services.transcription_service.WhisperModel')
+    @patch('audio_transcription.services.transcription_service.Pipeline')
+    def test_models_shared_across_instances(self, mock_pipeline, mock_whisper_model, mock_batched_pipeline):
+        """Test that models are loaded once and reused by new service instances"""
+        first = TranscriptionService(model_size='base')
+        first._load_models()
+        second = TranscriptionService(model_size='base')
+        second._load_models()
+        
+        mock_whisper_model.assert_called_once()
+        mock_pipeline.from_pretrained.assert_called_once()
+        self.assertIs(first.whisper_model, second.whisper_model)
+        self.assertIs(first.diarization_pipeline, second.diarization_pipeline)
+    
+    def test_diarization_cached_by_audio_key(self):
+        """Test that pyannote runs once per audio key and later calls hit the cache"""
+        service = TranscriptionService()
+        turn = MagicMock(start=0.0, end=1.5)
+        service.diarization_pipeline = MagicMock()
+        service.diarization_pipeline.return_value.itertracks.return_value = [(turn, None, 'SPEAKER_1')]
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(DIAR_CACHE_DIR=cache_dir):
+                first = service._perform_diarization(MagicMock(), cache_key='abc123')
+                second = service._perform_diarization(MagicMock(), cache_key='abc123')
+        
+        service.diarization_pipeline.assert_called_once()
+        self.assertEqual(first.to_list_of_dict(), [{'start': 0.0, 'end': 1.5, 'speaker': 'SPEAKER_1'}])
+        self.assertEqual(second.to_list_of_dict(), first.to_list_of_dict())
+    
+    def test_process_audio_stream_local_agreement(self):
+        """Test that words are emitted once two consecutive rounds agree on them"""
+        service = TranscriptionService()
+        rounds = iter([
+            [{'start': 0.0, 'end': 0.5, 'text': 'Hello'}, {'start': 0.6, 'end': 1.0, 'text': 'word'}],
+            [{'start': 0.0, 'end': 0.5, 'text': 'Hello'}, {'start': 0.6, 'end': 1.0, 'text': 'world'}],
+            [{'start': 0.6, 'end': 1.0, 'text': 'world'}],
+        ])
+        
+        with patch.object(service, '_load_whisper_model'), \
+                patch.object(service, '_load_diarization_pipeline') as mock_load_diarization, \
+                patch.object(service, '_decode_audio', return_value=MagicMock()) as mock_decode, \
+                patch.object(service, '_transcribe_words', side_effect=lambda *args: next(rounds)) as mock_words:
+            mock_decode.return_value.__getitem__.return_value.cpu.return_value.numpy.return_value = [0.0] * 48000
+            words = list(service.process_audio_stream('test.wav', chunk_seconds=1))
+        
+        mock_load_diarization.assert_not_called()
+        self.assertEqual([w['text'] for w in words], ['Hello', 'world'])
+        # Only 'Hello' was agreed on in round two, so round three re-decodes from its end
+        self.assertEqual(mock_words.call_args_list[2][0][1], 8000)
+    
+    def test_process_audio_stream_bounds_buffer(self):
+        """Test that silent rounds trim the buffer and disagreeing rounds are capped"""
+        service = TranscriptionService()
+        rounds = iter([
+            [],
+            [{'start': 1.2, 'end': 1.5, 'text': 'one'}],
+            [{'start': 1.2, 'end': 1.5, 'text': 'won'}],
+            [{'start': 1.2, 'end': 1.5, 'text': 'one'}, {'start': 2.0, 'end': 2.5, 'text': 'two'}],
+            [{'start': 2.6, 'end': 3.0, 'text': 'three'}],
+        ])
+        
+        with patch.object(service, '_load_whisper_model'), \
+                patch.object(service, '_decode_audio', return_value=MagicMock()) as mock_decode, \
+                patch.object(service, '_transcribe_words', side_effect=lambda *args: next(rounds)) as mock_words:
+            mock_decode.return_value.__getitem__.return_value.cpu.return_value.numpy.return_value = [0.0] * 160000
+            words = list(service.process_audio_stream('test.wav', chunk_seconds=2, max_buffer_seconds=6))
+        
+        starts = [call[0][1] for call in mock_words.call_args_list]
+        # Round one was silent, so round two keeps only its last second; round four
+        # reaches the 6s cap and commits 'one two' though it disagrees with round three
+        self.assertEqual(starts, [0, 16000, 16000, 16000, 40000])
+        self.assertEqual([w['text'] for w in words], ['one', 'two', 'three'])
+    
+    def test_process_audio_stream_keeps_word_after_agreed_round(self):
+        """Test that a fully agreed round does not drop a word straddling the window edge"""
+        service = TranscriptionService()
+        words = [
+            {'start': 0.2, 'end': 0.8, 'text': 'alpha'},
+            {'start': 1.0, 'end': 1.6, 'text': 'beta'},
+            {'start': 9.8, 'end': 10.4, 'text': 'epsilon'},
+            {'start': 11.0, 'end': 11.5, 'text': 'zeta'},
+        ]
+        
+        def transcribe_words(audio, start, end):
+            # Whisper only returns words that fit entirely inside the window
+            return [w for w in words if start / 16000 <= w['start'] and w['end'] <= end / 16000]
+        
+        with patch.object(service, '_load_whisper_model'), \
+                patch.object(service, '_decode_audio', return_value=MagicMock()) as mock_decode, \
+                patch.object(service, '_transcribe_words', side_effect=transcribe_words):
+            mock_decode.return_value.__getitem__.return_value.cpu.return_value.numpy.return_value = [0.0] * 240000
+            emitted = list(service.process_audio_stream('test.wav', chunk_seconds=5))
+        
+        # Round two agrees on everything it heard; epsilon crosses its 10s edge
+        self.assertEqual([w['text'] for w in emitted], ['alpha', 'beta', 'epsilon', 'zeta'])
+    
+    @patch('torch.compile')
+    def test_compile_segmentation_default_mode(self, mock_compile):
+        """Test that segmentation is compiled without CUDA graph capture"""
+        pipeline = MagicMock()
+        forward = pipeline._segmentation.model.forward
+        
+        TranscriptionService()._compile_segmentation(pipeline)
+        
+        mock_compile.assert_called_once_with(forward)
+        self.assertIs(pipeline._segmentation.model.forward, mock_compile.return_value)
+    
+    def test_transcribe_audio_without_speech_skips_whisper(self):
+        """Test that audio without speech is not handed to Whisper, which would rerun VAD"""
+        service = TranscriptionService()
+        service.whisper_model = MagicMock()
+        
+        transcription = service._transcribe_audio(torch.zeros(1, 32000), speech=[])
+        
+        service.whisper_model.transcribe.assert_not_called()
+        self.assertEqual(transcription, {'segments': [], 'text': '', 'duration': 2.0})
+    
+    def test_half_precision_casts_keyword_tensors(self):
+        """Test that the 16-bit wrapper casts float keyword arguments like weights=masks"""
+        class Embedding(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.scale = torch.nn.Parameter(torch.ones(1))
+            
+            def forward(self, waveforms, weights=None):
+                # Mixing dtypes here would raise, as it does in the real networks
+                assert waveforms.dtype == weights.dtype == self.scale.dtype
+                return waveforms * weights * self.scale
+        
+        pipeline = MagicMock()
+        pipeline._segmentation.model = None
+        pipeline._embedding.model = None
+        pipeline._embedding.model_ = Embedding()
+        
+        with patch('torch.cuda.is_bf16_supported', return_value=True):
+            TranscriptionService()._half_precision(pipeline)
+        
+        output = pipeline._embedding.model_(torch.ones(2), weights=torch.ones(2))
+        self.assertEqual(output.dtype, torch.float32)
+    
+    def test_restore_speech_times(self):
+        """Test that times in spliced speech map back to the original timeline"""
+        service = TranscriptionService()
+        # Speech at 1-3s and 10-12s, spliced into 0-2s and 2-4s
+        speech = [{'start': 16000, 'end': 48000}, {'start': 160000, 'end': 192000}]
+        times = np.array([0.5, 2.0, 3.0], dtype=np.float32)
+        
+        starts = service._restore_speech_times(times, speech, side='right')
+        ends = service._restore_speech_times(times, speech, side='left')
+        
+        np.testing.assert_allclose(starts, [1.5, 10.0, 11.0])
+        np.testing.assert_allclose(ends, [1.5, 3.0, 11.0])
+    
+    def test_merge_transcription_with_diarization(self):
+        """Test that each segment gets the speaker with the largest overlap"""
+        service = TranscriptionService()
+        transcription = {
+            'text': 'Hello there. General Kenobi. Silence.',
+            'segments': [
+                {'start': 0.0, 'end': 4.0, 'text': ' Hello there.'},
+                {'start': 4.0, 'end': 8.0, 'text': ' General Kenobi.'},
+                {'start': 20.0, 'end': 22.0, 'text': ' Silence.'}
+            ]
+        }
+        diarization = DiarSegments(
+            starts=np.array([0.0, 5.0, 6.0], dtype=np.float32),
+            ends=np.array([5.0, 6.0, 9.0], dtype=np.float32),
+            speakers=np.array([0, 1, 1], dtype=np.int16),
+            labels=['SPEAKER_1', 'SPEAKER_2']
+        )
+        
+        result = service._merge_transcription_with_diarization(transcription, diarization)
+        
+        speakers = [segment['speaker'] for segment in result['segments']]
+        self.assertEqual(speakers, ['SPEAKER_1', 'SPEAKER_2', 'UNKNOWN'])
+        self.assertEqual(result['segments'][0]['text'], 'Hello there.')
+        self.assertEqual(result['language'], 'en')
 
 
-class TranscriptionAPIViewTests(TestCase):
-    """Test cases for the transcription API views"""
+class TranscriptionTaskTests(TestCase):
+    """Test cases for the background transcription task"""
     
-    @patch('audio_transcription.views.TranscriptionService')
-    def test_transcription_api_view(self, mock_service_class):
-        """Test the transcription API view"""
-        # Mock the service and its process_audio method
+    @patch('audio_transcription.tasks.TranscriptionService')
+    def test_transcribe_task_stores_result(self, mock_service_class):
+        """Test that the task runs the service and marks the transcription completed"""
         mock_service = MagicMock()
         mock_service_class.return_value = mock_service
         mock_service.process_audio.return_value = {
             'text': 'Test transcription',
-            'segments': [
-                {'start': 0.0, 'end': 2.0, 'text': 'Test', 'speaker': 'SPEAKER_1'}
-            ],
-            'language': 'en'
+            'segments': [],
+            'language': 'en',
+            'duration': 2.5
         }
         
+        audio_file = AudioFile.objects.create(file='uploads/audio/test.mp3')
+        transcription = Transcription.objects.create(audio_file=audio_file)
+        
+        transcribe_task(audio_file.id, 'base')
+        
+        transcription.refresh_from_db()
+        audio_file.refresh_from_db()
+        mock_service_class.assert_called_once_with(model_size='base')
+        self.assertEqual(transcription.status, Transcription.Status.COMPLETED)
+        self.assertEqual(transcription.json_result['text'], 'Test transcription')
+        self.assertEqual(transcription.text, 'Test transcription')
+        self.assertEqual(transcription.language, 'en')
+        self.assertEqual(transcription.duration_seconds, 2.5)
+        self.assertIsNotNone(transcription.completed_at)
+        self.assertTrue(audio_file.processed)
+    
+    @patch('audio_transcription.tasks.TranscriptionService')
+    def test_transcribe_task_records_failure(self, mock_service_class):
+        """Test that a processing error marks the transcription failed"""
+        mock_service_class.return_value.process_audio.side_effect = RuntimeError('decode failed')
+        
+        audio_file = AudioFile.objects.create(file='uploads/audio/test.mp3')
+        transcription = Transcription.objects.create(audio_file=audio_file)
+        
+        transcribe_task(audio_file.id, 'base')
+        
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.status, Transcription.Status.FAILED)
+        self.assertEqual(transcription.error, 'decode failed')
+
+
+class TranscriptionAPIViewTests(TestCase):
+    """Test cases for the transcription API views"""
+    
+    def setUp(self):
+        """Store uploads in a throwaway media directory"""
+        media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_dir.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+    
+    @patch('audio_transcription.views.transcribe_task')
+    def test_transcription_api_view(self, mock_task):
+        """Test the transcription API view queues a job"""
         # Create a test audio file
         audio_content = b'test audio content'
         test_file = SimpleUploadedFile('test.mp3', audio_content, content_type='audio/mpeg')
         
         # Make a POST request to the transcription API
         url = reverse('transcribe_audio')
-        with patch('tempfile.NamedTemporaryFile'):
-            with patch('os.path.exists', return_value=True):
-                with patch('os.remove'):
-                    response = self.client.post(url, {'audio': test_file}, format='multipart')
+        response = self.client.post(url, {'audio': test_file}, format='multipart')
         
-        # Assert response is successful
-        self.assertEqual(response.status_code, 200)
+        # Assert the job was accepted
+        self.assertEqual(response.status_code, 202)
         
-        # Assert service was called correctly
-        mock_service_class.assert_called_once()
-        mock_service.process_audio.assert_called_once()
+        # Assert the task was queued for the stored file
+        audio_file = AudioFile.objects.get()
+        mock_task.delay.assert_called_once_with(audio_file.id, 'base')
         
         # Check response data
         response_data = response.json()
-        self.assertIn('text', response_data)
-        self.assertIn('segments', response_data)
-        self.assertEqual(response_data['text'], 'Test transcription')
\ No newline at end of file
+        self.assertEqual(response_data['status'], 'queued')
+        self.assertEqual(response_data['transcription_id'], audio_file.transcription.id)
+    
+    @patch('audio_transcription.views.transcribe_task')
+    def test_transcription_api_view_reuses_result_for_same_content(self, mock_task):
+        """Test that re-uploading identical bytes returns the stored result"""
+        url = reverse('transcribe_audio')
+        self.client.post(url, {'audio': SimpleUploadedFile('a.mp3', b'same bytes')}, format='multipart')
+        transcription = Transcription.objects.get()
+        transcription.status = Transcription.Status.COMPLETED
+        transcription.json_result = {'text': 'Hello', 'segments': []}
+        transcription.completed_at = timezone.now()
+        transcription.save()
+        
+        response = self.client.post(url, {'audio': SimpleUploadedFile('b.mp3', b'same bytes')}, format='multipart')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['transcription_id'], transcription.id)
+        self.assertEqual(response.json()['text'], 'Hello')
+        self.assertEqual(AudioFile.objects.count(), 1)
+        mock_task.delay.assert_called_once()
+    
+    @patch('audio_transcription.views.transcribe_task')
+    def test_transcription_api_view_fails_job_when_queueing_fails(self, mock_task):
+        """Test that a job the broker never accepted is failed so a retry re-queues it"""
+        url = reverse('transcribe_audio')
+        mock_task.delay.side_effect = ConnectionError('broker down')
+        response = self.client.post(url, {'audio': SimpleUploadedFile('a.mp3', b'same bytes')}, format='multipart')
+        
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(Transcription.objects.get().status, Transcription.Status.FAILED)
+        
+        mock_task.delay.side_effect = None
+        response = self.client.post(url, {'audio': SimpleUploadedFile('a.mp3', b'same bytes')}, format='multipart')
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(mock_task.delay.call_count, 2)
+    
+    @patch('audio_transcription.views.transcribe_task')
+    def test_transcription_api_view_dedup_keyed_on_model_size(self, mock_task):
+        """Test that the same file with a different model size gets its own job"""
+        url = reverse('transcribe_audio')
+        self.client.post(url, {'audio': SimpleUploadedFile('a.mp3', b'same bytes')}, format='multipart')
+        response = self.client.post(
+            url, {'audio': SimpleUploadedFile('a.mp3', b'same bytes'), 'model_size': 'large'}, format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            sorted(Transcription.objects.values_list('model_size', flat=True)), ['base', 'large']
+        )
+        self.assertEqual(mock_task.delay.call_count, 2)
+        mock_task.delay.assert_called_with(Transcription.objects.get(model_size='large').audio_file_id, 'large')
+    
+    @patch('audio_transcription.views.TranscriptionService')
+    @patch('audio_transcription.views.transcribe_task')
+    def test_transcription_api_views_reject_unknown_model_size(self, mock_task, mock_service_class):
+        """Test that model sizes outside the allowlist are rejected before any work"""
+        for name in ['transcribe_audio', 'transcribe_audio_stream']:
+            test_file = SimpleUploadedFile('test.wav', b'test audio content', content_type='audio/wav')
+            response = self.client.post(
+                reverse(name), {'audio': test_file, 'model_size': 'someone/huge-model'}, format='multipart'
+            )
+            self.assertEqual(response.status_code, 400)
+        
+        self.assertFalse(AudioFile.objects.exists())
+        mock_task.delay.assert_not_called()
+        mock_service_class.assert_not_called()
+    
+    @patch('audio_transcription.views.TranscriptionService')
+    def test_transcription_stream_api_view(self, mock_service_class):
+        """Test the streaming view emits one JSON line per word"""
+        mock_service_class.return_value.process_audio_stream.return_value = iter([
+            {'start': 0.0, 'end': 0.5, 'text': 'Hello'},
+            {'start': 0.6, 'end': 1.0, 'text': 'world'}
+        ])
+        test_file = SimpleUploadedFile('test.wav', b'test audio content', content_type='audio/wav')
+        
+        url = reverse('transcribe_audio_stream')
+        response = self.client.post(url, {'audio': test_file}, format='multipart')
+        
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['text'] for line in lines], ['Hello', 'world'])
+    
+    @patch('audio_transcription.views.TranscriptionService')
+    def test_transcription_stream_api_view_no_temp_file_before_streaming(self, mock_service_class):
+        """Test that a stream closed before its first word leaves no temporary copy"""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        test_file = SimpleUploadedFile('test.wav', b'test audio content', content_type='audio/wav')
+        
+        with override_settings(TEMP_DIR=temp_dir.name):
+            response = self.client.post(reverse('transcribe_audio_stream'), {'audio': test_file}, format='multipart')
+            response.close()
+        
+        self.assertEqual(os.listdir(temp_dir.name), [])
+        mock_service_class.return_value.process_audio_stream.assert_not_called()
+    
+    def test_transcription_list_view(self):
+        """Test the list view previews text in a single query"""
+        for text in ['Short text', 'x' * 150]:
+            audio_file = AudioFile.objects.create()
+            Transcription.objects.create(
+                audio_file=audio_file,
+                status=Transcription.Status.COMPLETED,
+                json_result={'text': text, 'segments': []},
+                text=text
+            )
+        
+        url = reverse('list_transcriptions')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        previews = sorted(t['text'] for t in response.json())
+        self.assertEqual(previews, ['Short text', 'x' * 100 + '...'])
+    
+    def test_transcription_list_view_includes_pending(self):
+        """Test that a newly queued job is listed ahead of older completed ones"""
+        for _ in range(10):
+            Transcription.objects.create(
+                audio_file=AudioFile.objects.create(),
+                status=Transcription.Status.COMPLETED,
+                completed_at=timezone.now()
+            )
+        pending = Transcription.objects.create(audio_file=AudioFile.objects.create())
+        
+        response = self.client.get(reverse('list_transcriptions'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 10)
+        self.assertEqual(response.json()[0]['id'], pending.id)
+        self.assertIsNone(response.json()[0]['completed_at'])
+    
+    def test_transcription_detail_pending(self):
+        """Test that the detail view reports status for a queued job"""
+        audio_file = AudioFile.objects.create()
+        transcription = Transcription.objects.create(audio_file=audio_file)
+        
+        url = reverse('transcription_detail', args=[transcription.id])
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'transcription_id': transcription.id,
+            'status': 'queued'
+        })
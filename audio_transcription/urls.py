@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import TranscriptionAPIView, TranscriptionDetailAPIView
+from .views import TranscriptionAPIView, TranscriptionDetailAPIView, TranscriptionStreamAPIView
 
 urlpatterns = [
     path('transcribe/', TranscriptionAPIView.as_view(), name='transcribe_audio'),
+    path('transcribe/stream/', TranscriptionStreamAPIView.as_view(), name='transcribe_audio_stream'),
     path('transcriptions/', TranscriptionAPIView.as_view(), name='list_transcriptions'),
     path('transcriptions/<int:transcription_id>/', TranscriptionDetailAPIView.as_view(), name='transcription_detail'),
 ]
\ No newline at end of file
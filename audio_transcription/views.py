@@ -3,16 +3,46 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
-from django.utils import timezone
+from django.db.models.functions import Substr
+from django.http import StreamingHttpResponse
 import os
+import orjson
+import shutil
 import tempfile
 import logging
+from pathlib import Path
 
-from .models import AudioFile, Transcription
-from .services.transcription_service import TranscriptionService
+from .models import AudioFile, HashingFile, Transcription
+from .services.transcription_service import TranscriptionService, WHISPER_MODEL_SIZES
+from .tasks import transcribe_task
 
 logger = logging.getLogger(__name__)
 
+def transcription_response_data(transcription):
+    """Build the response body for a transcription in any state"""
+    response_data = {
+        'transcription_id': transcription.id,
+        'status': transcription.status
+    }
+    
+    if transcription.status == Transcription.Status.COMPLETED:
+        # The stored result already has the response shape
+        response_data.update(transcription.json_result)
+        response_data['processed_at'] = transcription.completed_at.isoformat()
+    elif transcription.status == Transcription.Status.FAILED:
+        response_data['error'] = transcription.error
+    
+    return response_data
+
+def invalid_model_size_response(model_size):
+    """Return a 400 response for a model size outside the allowlist, or None"""
+    if model_size in WHISPER_MODEL_SIZES:
+        return None
+    return Response(
+        {"error": f"model_size must be one of: {', '.join(WHISPER_MODEL_SIZES)}"},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
 class TranscriptionAPIView(APIView):
     """
     API endpoint for audio transcription with diarization
@@ -21,7 +51,7 @@ class TranscriptionAPIView(APIView):
     
     def post(self, request, *args, **kwargs):
         """
-        Process an audio file and return transcription with diarization
+        Queue an audio file for transcription with diarization
         """
         # Check if audio file is provided
         if 'audio' not in request.FILES:
@@ -32,73 +62,84 @@ class TranscriptionAPIView(APIView):
         
         audio_file = request.FILES['audio']
         
-        # Save audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, dir=settings.TEMP_DIR, suffix=os.path.splitext(audio_file.name)[1]) as temp_file:
-            for chunk in audio_file.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
+        # Get model size from request or use default
+        model_size = request.data.get('model_size', 'base')
+        error_response = invalid_model_size_response(model_size)
+        if error_response is not None:
+            return error_response
         
         try:
-            # Get model size from request or use default
-            model_size = request.data.get('model_size', 'base')
-            
-            # Initialize the transcription service with specified model size
-            transcription_service = TranscriptionService(model_size=model_size)
+            # Store the upload, hashing it in the same pass that writes it
+            audio_model = AudioFile()
+            upload = HashingFile(audio_file)
+            audio_model.file.save(audio_file.name, upload, save=False)
+            digest = upload.hexdigest()
             
-            # Process the audio file
-            result = transcription_service.process_audio(temp_file_path)
-            
-            # Save to database (optional, for keeping track of processed files)
-            audio_model = AudioFile.objects.create(
-                file=audio_file,
-                processed=True
-            )
-            
-            transcription = Transcription.objects.create(
-                audio_file=audio_model,
-                json_result=result,
-                completed_at=timezone.now()
-            )
+            # Identical bytes were already submitted for this model: reuse that job
+            # instead of re-running the pipeline. Failed jobs are skipped so retries work.
+            existing = Transcription.objects.filter(
+                audio_file__content_sha256=digest,
+                model_size=model_size
+            ).exclude(
+                status=Transcription.Status.FAILED
+            ).order_by('-id').first()
             
-            # Remove the temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            if existing is not None:
+                audio_model.file.delete(save=False)
+                if existing.status == Transcription.Status.COMPLETED:
+                    return Response(transcription_response_data(existing), status=status.HTTP_200_OK)
+                return Response(transcription_response_data(existing), status=status.HTTP_202_ACCEPTED)
             
-            # Format the response for the API
-            response_data = {
-                'transcription_id': transcription.id,
-                'text': result['text'],
-                'segments': result['segments'],
-                'language': result.get('language', 'en'),
-                'processed_at': transcription.completed_at.isoformat()
-            }
+            audio_model.content_sha256 = digest
+            audio_model.save()
+            transcription = Transcription.objects.create(audio_file=audio_model, model_size=model_size)
             
-            return Response(response_data, status=status.HTTP_200_OK)
+            # Process in a worker; clients poll the detail endpoint for the result
+            try:
+                transcribe_task.delay(audio_model.id, model_size)
+            except Exception as e:
+                # No worker will ever pick this job up; fail it so a retry starts fresh
+                transcription.status = Transcription.Status.FAILED
+                transcription.error = f"Could not queue transcription: {str(e)}"
+                transcription.save(update_fields=['status', 'error'])
+                raise
             
         except Exception as e:
-            logger.error(f"Error in transcription process: {str(e)}")
-            
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            
+            logger.error(f"Error queuing transcription: {str(e)}")
             return Response(
                 {"error": f"Transcription failed: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        return Response({
+            'transcription_id': transcription.id,
+            'status': transcription.status
+        }, status=status.HTTP_202_ACCEPTED)
             
     def get(self, request, *args, **kwargs):
         """
         Get a list of previous transcriptions
         """
-        transcriptions = Transcription.objects.all().order_by('-completed_at')[:10]
+        # Slice the text in SQL so full results never leave the database;
+        # one extra character tells us whether the preview was truncated.
+        # Newest jobs first by id: pending jobs have no completed_at, and
+        # databases disagree on where NULLs sort
+        transcriptions = Transcription.objects.only(
+            'id', 'audio_file_id', 'status', 'completed_at'
+        ).annotate(
+            text_preview=Substr('text', 1, 101)
+        ).order_by('-id')[:10]
         
-        response_data = [{
-            'id': t.id,
-            'audio_file_id': t.audio_file.id,
-            'completed_at': t.completed_at.isoformat(),
-            'text': t.json_result.get('text', '')[:100] + '...' if len(t.json_result.get('text', '')) > 100 else t.json_result.get('text', '')
-        } for t in transcriptions]
+        response_data = []
+        for t in transcriptions:
+            text = t.text_preview or ''
+            response_data.append({
+                'id': t.id,
+                'audio_file_id': t.audio_file_id,
+                'status': t.status,
+                'completed_at': t.completed_at.isoformat() if t.completed_at else None,
+                'text': text[:100] + '...' if len(text) > 100 else text
+            })
         
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -114,15 +155,7 @@ class TranscriptionDetailAPIView(APIView):
         try:
             transcription = Transcription.objects.get(id=transcription_id)
             
-            response_data = {
-                'transcription_id': transcription.id,
-                'text': transcription.json_result.get('text', ''),
-                'segments': transcription.json_result.get('segments', []),
-                'language': transcription.json_result.get('language', 'en'),
-                'processed_at': transcription.completed_at.isoformat()
-            }
-            
-            return Response(response_data, status=status.HTTP_200_OK)
+            return Response(transcription_response_data(transcription), status=status.HTTP_200_OK)
             
         except Transcription.DoesNotExist:
             return Response(
@@ -134,4 +167,55 @@ class TranscriptionDetailAPIView(APIView):
             return Response(
                 {"error": f"Failed to retrieve transcription: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class TranscriptionStreamAPIView(APIView):
+    """
+    API endpoint streaming transcription words as they become stable
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    
+    def post(self, request, *args, **kwargs):
+        """
+        Transcribe an audio file, streaming words as JSON lines
+        """
+        # Check if audio file is provided
+        if 'audio' not in request.FILES:
+            return Response(
+                {"error": "No audio file provided"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        audio_file = request.FILES['audio']
+        
+        # Get model size from request or use default
+        model_size = request.data.get('model_size', 'base')
+        error_response = invalid_model_size_response(model_size)
+        if error_response is not None:
+            return error_response
+        transcription_service = TranscriptionService(model_size=model_size)
+        
+        suffix = os.path.splitext(audio_file.name)[1]
+        
+        def stream():
+            # The copy is made inside the generator so it is removed by the finally
+            # below, even when the client disconnects before the first word
+            temp_file_path = None
+            try:
+                # Save audio file temporarily, copying in 1MB blocks
+                with tempfile.NamedTemporaryFile(delete=False, dir=settings.TEMP_DIR, suffix=suffix) as temp_file:
+                    temp_file_path = temp_file.name
+                    shutil.copyfileobj(audio_file, temp_file, length=1 << 20)
+                
+                for word in transcription_service.process_audio_stream(temp_file_path):
+                    yield orjson.dumps(word) + b'\n'
+            except Exception as e:
+                logger.error(f"Error in streaming transcription: {str(e)}")
+                yield orjson.dumps({"error": f"Transcription failed: {str(e)}"}) + b'\n'
+            finally:
+                # Remove the temporary file once the stream ends
+                if temp_file_path is not None:
+                    Path(temp_file_path).unlink(missing_ok=True)
+        
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
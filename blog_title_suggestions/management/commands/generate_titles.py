@@ -33,7 +33,7 @@ class Command(BaseCommand):
         # Initialize the title generator
         self.stdout.write('Generating title suggestions...')
         
-        title_generator = TitleGenerator()
+        title_generator = TitleGenerator.get()
         try:
             suggestions = title_generator.generate_title_suggestions(
                 content=content,
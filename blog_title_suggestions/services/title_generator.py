@@ -1,84 +1,235 @@
+import functools
+import hashlib
 import logging
+import os
+import shutil
+import tempfile
 import torch
-from transformers import T5ForConditionalGeneration, T5Tokenizer
-import numpy as np
-from typing import List, Dict, Any
+from typing import List, Optional
 import re
+import threading
+from collections import Counter, OrderedDict
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r'\s+')
+# Raw characters kept from long posts; comfortably more than _MAX_INPUT_TOKENS of text
+_MAX_CONTENT_CHARS = 8192
+# T5 input budget; titles need the opening of a post, not its full length
+_MAX_INPUT_TOKENS = 512
+
+# Rule-based title templates in preference order, as (needs second keyword, formatter)
+_TITLE_TEMPLATES = (
+    (False, lambda a, b: f"The Ultimate Guide to {a}"),
+    (False, lambda a, b: f"How to Master {a} in Simple Steps"),
+    (False, lambda a, b: f"{a}: A Comprehensive Analysis"),
+    (False, lambda a, b: f"Understanding {a}: Key Insights and Strategies"),
+    (True, lambda a, b: f"The Essential Guide to {a} and {b}"),
+    (False, lambda a, b: f"Why {a} Matters in Today's World"),
+    (False, lambda a, b: f"{a}: Trends and Future Perspectives"),
+)
+
+# Recent suggestions keyed by (content hash, num_suggestions) so re-submitted posts skip the model
+_SUGGESTION_CACHE = OrderedDict()
+_SUGGESTION_CACHE_SIZE = 256
+_SUGGESTION_CACHE_LOCK = threading.Lock()
+
+# Dummy post used to trigger compilation at startup
+_PREWARM_CONTENT = "Warming up the title generation model before the first request. " * 8
+
+# Posts this short are fully covered by their first sentence and keywords
+_TRIVIAL_CONTENT_CHARS = 280
+
+# Runs of text between sentence terminators
+_SENTENCE_RE = re.compile(r'[^.!?]+')
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Common words (simplified stopwords list)
+_STOPWORDS = frozenset({"the", "a", "an", "and", "or", "but", "is", "are", "was", "were",
+                        "in", "on", "at", "to", "for", "with", "by", "about", "of"})
+
+def _dedupe_titles(titles: List[str]) -> List[str]:
+    """Drop titles that differ from an earlier one only by case or trailing punctuation"""
+    seen = set()
+    unique = []
+    for title in titles:
+        key = title.lower().rstrip(' .!?:')
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(title)
+    return unique
+
+def _first_sentence(content: str) -> str:
+    """Return the first non-blank sentence of the content"""
+    # Stops at the first hit, and the pattern matches in linear time
+    for match in _SENTENCE_RE.finditer(content):
+        sentence = match.group().strip()
+        if sentence:
+            return sentence
+    return ""
+
+@functools.lru_cache(maxsize=None)
+def _cpu_supports_vnni() -> bool:
+    """Whether the CPU has VNNI int8 dot-product instructions"""
+    # Without VNNI int8 GEMMs can be slower than FP32, so only quantize with it
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read().split()
+    except OSError:
+        return False
+    return 'avx512_vnni' in flags or 'avx_vnni' in flags
+
 class TitleGenerator:
     """Service for generating blog title suggestions using NLP models"""
     
-    def __init__(self, model_name: str = "t5-base"):
+    _instance = None
+    _instance_lock = threading.Lock()
+    
+    def __init__(self, model_name: Optional[str] = None):
         """Initialize the title generator with the specified model"""
-        self.model_name = model_name
+        self.model_name = model_name or settings.TITLE_MODEL_NAME
+        # ONNX Runtime sessions use the CPU provider; only the PyTorch model moves to the GPU
+        use_cuda = torch.cuda.is_available() and settings.TITLE_MODEL_BACKEND != 'onnx'
+        self.device = "cuda" if use_cuda else "cpu"
+        # T5 overflows easily in fp16, so prefer bf16 where the GPU has it
+        if self.device == "cuda":
+            self.dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        else:
+            self.dtype = torch.float32
         self.model = None
         self.tokenizer = None
+        self._load_lock = threading.Lock()
+    
+    @classmethod
+    def get(cls) -> "TitleGenerator":
+        """Return the process-wide generator so weights are loaded only once"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
         
     def _load_model(self):
         """Load the NLP model (lazy loading to save resources)"""
-        if self.model is None or self.tokenizer is None:
-            logger.info(f"Loading title generation model: {self.model_name}")
-            try:
-                self.tokenizer = T5Tokenizer.from_pretrained(self.model_name)
-                self.model = T5ForConditionalGeneration.from_pretrained(self.model_name)
-            except Exception as e:
-                logger.error(f"Error loading title generation model: {e}")
-                raise
+        if self.model is not None and self.tokenizer is not None:
+            return
+        
+        # Concurrent first requests must not load the weights twice
+        with self._load_lock:
+            if self.model is None or self.tokenizer is None:
+                logger.info(f"Loading title generation model: {self.model_name}")
+                try:
+                    # transformers takes seconds to import; only pay for it once titles are needed
+                    from transformers import T5ForConditionalGeneration, T5TokenizerFast
+                    
+                    self.tokenizer = T5TokenizerFast.from_pretrained(self.model_name)
+                    if settings.TITLE_MODEL_BACKEND == 'onnx':
+                        model = self._load_onnx_model()
+                    else:
+                        model = T5ForConditionalGeneration.from_pretrained(
+                            self.model_name, torch_dtype=torch.float32
+                        )
+                        model = model.to(self.device, dtype=self.dtype).eval()
+                        if self.device == "cpu":
+                            model = self._quantize(model)
+                        if settings.TITLE_MODEL_COMPILE:
+                            self._compile_decoding(model)
+                    self.model = model
+                except Exception as e:
+                    logger.error(f"Error loading title generation model: {e}")
+                    raise
+    
+    def _compile_decoding(self, model):
+        """Compile the T5 forward pass that generate() calls once per token"""
+        # Decoding steps are not captured as CUDA graphs: graphs need fixed shapes,
+        # but generate() grows past_key_values every step and transformers 4.35 has
+        # no static cache, so each step and prompt length would need its own graph
+        # and, on torch 2.0, its own Inductor compile.
+        try:
+            from darwix_ai_project.compilation import compile_forward
+            
+            # Prompt and past lengths change every step and request, so compile with
+            # dynamic shapes: one graph serves every length instead of a recompile per shape
+            compile_forward(model, dynamic=True)
+        except Exception as e:
+            logger.warning(f"Could not compile title model, using eager mode: {e}")
+    
+    def prewarm(self):
+        """Load the model and run one generation so compilation happens before serving"""
+        self._load_model()
+        self._generate_title_with_model(_PREWARM_CONTENT)
+    
+    def _quantize(self, model):
+        """Swap the Linear layers for dynamic INT8 ones when running on a capable CPU"""
+        if (not settings.TITLE_MODEL_QUANTIZE or self.device != "cpu"
+                or 'fbgemm' not in torch.backends.quantized.supported_engines
+                or not _cpu_supports_vnni()):
+            return model
+        
+        try:
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning(f"INT8 quantization failed, using FP32 model: {e}")
+            return model
+    
+    def _load_onnx_model(self):
+        """Load the model as ONNX Runtime sessions, exporting it on first use"""
+        # Only needed for this backend, so keep it out of the import path
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        
+        # Full graph optimization fuses LayerNorm/GELU/attention subgraphs
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = os.cpu_count()
+        
+        export_dir = os.path.join(settings.TITLE_ONNX_DIR, self.model_name.replace('/', '--'))
+        if os.path.isdir(export_dir):
+            return ORTModelForSeq2SeqLM.from_pretrained(export_dir, session_options=session_options)
+        
+        logger.info(f"Exporting {self.model_name} to ONNX in {export_dir}")
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            self.model_name, export=True, session_options=session_options
+        )
+        
+        # Save next to the target and rename so other workers never see a partial export
+        tmp_dir = tempfile.mkdtemp(dir=settings.TITLE_ONNX_DIR)
+        model.save_pretrained(tmp_dir)
+        try:
+            os.rename(tmp_dir, export_dir)
+        except OSError:
+            # Another worker finished its export first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        return model
     
     def _preprocess_content(self, content: str) -> str:
         """Preprocess the blog content for input to the model"""
+        # The tokenizer keeps only the first 512 tokens, so whitespace is
+        # normalized on a bounded prefix instead of the whole post
+        content = content[:_MAX_CONTENT_CHARS]
+        
         # Remove extra whitespace
-        content = re.sub(r'\s+', ' ', content).strip()
-        
-        # If content is too long, take the beginning and end
-        max_length = 1024
-        if len(content) > max_length:
-            # Extract beginning paragraphs and conclusion
-            paragraphs = content.split('\n\n')
-            
-            if len(paragraphs) >= 3:
-                # Take first paragraph, last paragraph, and one from the middle
-                selected = [
-                    paragraphs[0],
-                    paragraphs[len(paragraphs) // 2],
-                    paragraphs[-1]
-                ]
-                content = ' '.join(selected)
-            else:
-                # Just truncate if not enough paragraphs
-                half_length = max_length // 2
-                content = content[:half_length] + " ... " + content[-half_length:]
+        content = _WHITESPACE_RE.sub(' ', content).strip()
         
         return content
     
-    def _extract_keywords(self, content: str, num_keywords: int = 5) -> List[str]:
+    def _extract_keywords(self, content: str, num_keywords: int = 5,
+                          first_sentence: Optional[str] = None) -> List[str]:
         """Extract key phrases from the content"""
         # This is a simplified keyword extraction
         # In a production environment, consider using KeyBERT or similar libraries
         
-        # Split into sentences and remove punctuation
-        sentences = re.split(r'[.!?]', content)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
         # Simple approach: take first sentence as it often contains key information
-        first_sentence = sentences[0] if sentences else ""
+        if first_sentence is None:
+            first_sentence = _first_sentence(content)
         
-        # Remove common words (simplified stopwords list)
-        stopwords = {"the", "a", "an", "and", "or", "but", "is", "are", "was", "were", 
-                    "in", "on", "at", "to", "for", "with", "by", "about", "of"}
-        
-        words = [word.lower() for word in re.findall(r'\b\w+\b', first_sentence) 
-                if word.lower() not in stopwords and len(word) > 3]
+        words = (word.lower() for word in _WORD_RE.findall(first_sentence)
+                 if len(word) > 3 and word.lower() not in _STOPWORDS)
         
         # Return most frequent words
-        word_freq = {}
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        
-        keywords = sorted(word_freq.keys(), key=lambda x: word_freq[x], reverse=True)
-        return keywords[:num_keywords]
+        return [word for word, _ in Counter(words).most_common(num_keywords)]
     
     def _generate_title_with_model(self, content: str) -> List[str]:
         """Generate title suggestions using the T5 model"""
@@ -89,40 +240,27 @@ class TitleGenerator:
             prompt = f"summarize: {content}"
             
             # Tokenize the prompt
-            inputs = self.tokenizer(prompt, return_tensors="pt", max_length=1024, truncation=True)
-            
-            # Generate titles with different parameters
-            titles = []
-            
-            # More creative titles
-            outputs = self.model.generate(
-                inputs.input_ids,
-                max_length=30,
-                num_return_sequences=2,
-                temperature=0.9,
-                top_k=50,
-                top_p=0.95,
-                do_sample=True,
-                early_stopping=True
-            )
-            for output in outputs:
-                title = self.tokenizer.decode(output, skip_special_tokens=True)
-                titles.append(title)
-            
-            # More straightforward title
-            outputs = self.model.generate(
-                inputs.input_ids,
-                max_length=30,
-                num_return_sequences=1,
-                temperature=0.7,
-                early_stopping=True
-            )
-            title = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            titles.append(title)
+            inputs = self.tokenizer(prompt, return_tensors="pt", max_length=_MAX_INPUT_TOKENS, truncation=True).to(self.device)
+            
+            # Inference only: skip autograd bookkeeping
+            with torch.inference_mode():
+                # One sampling call decodes all candidates as a single batch
+                outputs = self.model.generate(
+                    inputs.input_ids,
+                    attention_mask=inputs.attention_mask,
+                    max_length=30,
+                    num_return_sequences=3,
+                    temperature=0.85,
+                    top_k=50,
+                    top_p=0.95,
+                    do_sample=True,
+                    early_stopping=True
+                )
+            titles = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
             
-            # Clean up titles
-            titles = [t.strip() for t in titles]
-            titles = [t[0].upper() + t[1:] if t else "" for t in titles]  # Capitalize first letter
+            # Clean up titles: drop empty ones, capitalize the first letter only
+            # (str.capitalize would lowercase acronyms and names)
+            titles = [t[:1].upper() + t[1:] for t in (t.strip() for t in titles) if t]
             
             return titles
             
@@ -131,35 +269,25 @@ class TitleGenerator:
             # Fall back to rule-based generation if model fails
             return None
     
-    def _generate_title_rule_based(self, content: str, keywords: List[str]) -> List[str]:
+    def _generate_title_rule_based(self, content: str, keywords: List[str],
+                                   first_sentence: Optional[str] = None) -> List[str]:
         """Generate title suggestions using rule-based approaches"""
-        templates = [
-            "The Ultimate Guide to {0}",
-            "How to Master {0} in Simple Steps",
-            "{0}: A Comprehensive Analysis",
-            "Understanding {0}: Key Insights and Strategies",
-            "The Essential Guide to {0} and {1}",
-            "Why {0} Matters in Today's World",
-            "{0}: Trends and Future Perspectives"
-        ]
-        
         titles = []
         
         # Get the first sentence to use as a potential title
-        first_sentence = content.split('.')[0].strip()
+        if first_sentence is None:
+            first_sentence = _first_sentence(content)
         if len(first_sentence) < 70 and len(first_sentence) > 10:
             titles.append(first_sentence)
         
         # Use templates with keywords
-        for template in templates:
-            if "{1}" in template:
-                if len(keywords) >= 2:
-                    title = template.format(keywords[0].capitalize(), keywords[1].capitalize())
-                    titles.append(title)
-            else:
-                if keywords:
-                    title = template.format(keywords[0].capitalize())
-                    titles.append(title)
+        if keywords:
+            first = keywords[0].title()
+            second = keywords[1].title() if len(keywords) >= 2 else None
+            titles.extend(
+                template(first, second) for needs_second, template in _TITLE_TEMPLATES
+                if second or not needs_second
+            )
         
         return titles[:5]  # Return up to 5 template-based titles
     
@@ -169,14 +297,35 @@ class TitleGenerator:
             # Preprocess content
             processed_content = self._preprocess_content(content)
             
+            cache_key = (
+                hashlib.blake2b(processed_content.encode('utf-8'), digest_size=16).digest(),
+                num_suggestions
+            )
+            with _SUGGESTION_CACHE_LOCK:
+                cached = _SUGGESTION_CACHE.get(cache_key)
+                if cached is not None:
+                    _SUGGESTION_CACHE.move_to_end(cache_key)
+                    return list(cached)
+            
+            # Both the keywords and the rule-based titles start from the first sentence
+            first_sentence = _first_sentence(processed_content)
+            
             # Extract keywords
-            keywords = self._extract_keywords(processed_content)
+            keywords = self._extract_keywords(processed_content, first_sentence=first_sentence)
             
-            # Try model-based generation first
-            model_titles = self._generate_title_with_model(processed_content)
+            # Rule-based titles are cheap, so build them first
+            rule_based_titles = self._generate_title_rule_based(
+                processed_content, keywords, first_sentence=first_sentence
+            )
             
-            # Fall back to rule-based if model fails
-            rule_based_titles = self._generate_title_rule_based(processed_content, keywords)
+            # Model titles lead the list; skip the model only for trivial posts
+            # where the rule-based titles already give enough distinct options
+            model_titles = None
+            model_failed = False
+            if (len(processed_content) > _TRIVIAL_CONTENT_CHARS
+                    or len(_dedupe_titles(rule_based_titles)) < num_suggestions):
+                model_titles = self._generate_title_with_model(processed_content)
+                model_failed = model_titles is None
             
             # Combine and select the best suggestions
             all_titles = []
@@ -186,10 +335,18 @@ class TitleGenerator:
             
             all_titles.extend(rule_based_titles)
             
-            # Remove duplicates and select requested number
-            unique_titles = list(dict.fromkeys(all_titles))
+            # Remove near-duplicates and select requested number
+            unique_titles = _dedupe_titles(all_titles)[:num_suggestions]
+            
+            # Don't pin rule-based-only results from a failed model run
+            if not model_failed:
+                with _SUGGESTION_CACHE_LOCK:
+                    _SUGGESTION_CACHE[cache_key] = tuple(unique_titles)
+                    _SUGGESTION_CACHE.move_to_end(cache_key)
+                    while len(_SUGGESTION_CACHE) > _SUGGESTION_CACHE_SIZE:
+                        _SUGGESTION_CACHE.popitem(last=False)
             
-            return unique_titles[:num_suggestions]
+            return unique_titles
             
         except Exception as e:
             logger.error(f"Error generating title suggestions: {e}")
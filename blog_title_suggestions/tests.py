@@ -1,9 +1,13 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+import os
 import json
+import tempfile
+import torch
 from unittest.mock import patch, MagicMock
 
 from .models import BlogPost, TitleSuggestion
+from .services import title_generator
 from .services.title_generator import TitleGenerator
 
 
@@ -40,25 +44,34 @@ class BlogTitleModelsTests(TestCase):
 class TitleGeneratorTests(TestCase):
     """Test cases for the title generator service"""
     
-    @patch('blog_title_suggestions.services.title_generator.T5ForConditionalGeneration')
-    @patch('blog_title_suggestions.services.title_generator.T5Tokenizer')
+    def setUp(self):
+        # Suggestions are cached per process; start every test cold
+        title_generator._SUGGESTION_CACHE.clear()
+    
+    @override_settings(TITLE_MODEL_QUANTIZE=False, TITLE_MODEL_COMPILE=False)
+    @patch('transformers.T5ForConditionalGeneration')
+    @patch('transformers.T5TokenizerFast')
     def test_generate_title_suggestions(self, mock_tokenizer_class, mock_model_class):
         """Test the generate_title_suggestions method"""
         # Mock the tokenizer
         mock_tokenizer = MagicMock()
         mock_tokenizer_class.from_pretrained.return_value = mock_tokenizer
-        mock_tokenizer.return_value = {'input_ids': MagicMock()}
-        mock_tokenizer.decode.side_effect = lambda x, skip_special_tokens: f"Generated Title {x}"
+        mock_tokenizer.return_value.to.return_value = mock_tokenizer.return_value
+        mock_tokenizer.batch_decode.side_effect = lambda outputs, skip_special_tokens: [
+            f"Generated Title {x}" for x in outputs
+        ]
         
         # Mock the model
         mock_model = MagicMock()
         mock_model_class.from_pretrained.return_value = mock_model
+        mock_model.to.return_value = mock_model
+        mock_model.eval.return_value = mock_model
         mock_model.generate.return_value = [1, 2, 3]
         
         # Create an instance of the generator and generate titles
         generator = TitleGenerator()
         suggestions = generator.generate_title_suggestions(
-            content="This is a test blog post about machine learning.",
+            content="This is a test blog post about machine learning. " * 10,
             num_suggestions=3
         )
         
@@ -66,9 +79,128 @@ class TitleGeneratorTests(TestCase):
         mock_tokenizer_class.from_pretrained.assert_called_once()
         mock_model_class.from_pretrained.assert_called_once()
         
+        # All candidates come from a single batched generate call
+        mock_model.generate.assert_called_once()
+        self.assertEqual(mock_model.generate.call_args.kwargs['num_return_sequences'], 3)
+        
         # Assert we get the expected number of suggestions
         self.assertEqual(len(suggestions), 3)
+        self.assertTrue(suggestions[0].startswith("Generated Title"))
 
+    
+    @patch('torch.compile')
+    def test_compile_decoding_uses_dynamic_shapes(self, mock_compile):
+        """Test that only the forward pass is compiled, once for every input length"""
+        model = MagicMock()
+        forward = model.forward
+        
+        TitleGenerator()._compile_decoding(model)
+        
+        mock_compile.assert_called_once_with(forward, dynamic=True)
+        self.assertIs(model.forward, mock_compile.return_value)
+    
+    @override_settings(TITLE_MODEL_BACKEND='onnx')
+    @patch('optimum.onnxruntime.ORTModelForSeq2SeqLM')
+    @patch('transformers.T5TokenizerFast')
+    def test_onnx_export_reused(self, mock_tokenizer_class, mock_ort_class):
+        """Test that the ONNX export is saved once and reloaded afterwards"""
+        mock_ort_class.from_pretrained.return_value.save_pretrained.side_effect = (
+            lambda path: open(os.path.join(path, 'encoder_model.onnx'), 'w').close()
+        )
+        
+        with tempfile.TemporaryDirectory() as onnx_dir, override_settings(TITLE_ONNX_DIR=onnx_dir):
+            TitleGenerator(model_name='org/model')._load_model()
+            TitleGenerator(model_name='org/model')._load_model()
+            
+            export_dir = os.path.join(onnx_dir, 'org--model')
+            self.assertTrue(os.path.isfile(os.path.join(export_dir, 'encoder_model.onnx')))
+        
+        first_call, second_call = mock_ort_class.from_pretrained.call_args_list
+        self.assertEqual(first_call.args, ('org/model',))
+        self.assertTrue(first_call.kwargs['export'])
+        self.assertEqual(second_call.args, (export_dir,))
+    
+    def test_short_post_skips_model(self):
+        """Test that trivial posts are served from rule-based titles alone"""
+        generator = TitleGenerator()
+        with patch.object(generator, '_generate_title_with_model') as mock_generate:
+            suggestions = generator.generate_title_suggestions(
+                content="This is a test blog post about machine learning.",
+                num_suggestions=3
+            )
+        
+        mock_generate.assert_not_called()
+        self.assertEqual(suggestions[0], "This is a test blog post about machine learning")
+        self.assertEqual(len(suggestions), 3)
+    
+    def test_repeated_content_served_from_cache(self):
+        """Test that re-submitted content skips generation"""
+        generator = TitleGenerator()
+        content = "Caching repeated blog posts saves model time. " * 10
+        with patch.object(generator, '_generate_title_with_model', return_value=["Cached Title"]) as mock_generate:
+            first = generator.generate_title_suggestions(content=content, num_suggestions=3)
+            second = generator.generate_title_suggestions(content=content, num_suggestions=3)
+            generator.generate_title_suggestions(content=content, num_suggestions=2)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], "Cached Title")
+        self.assertEqual(mock_generate.call_count, 2)
+    
+    def test_near_duplicate_titles_removed(self):
+        """Test that titles differing only by case or trailing punctuation are merged"""
+        generator = TitleGenerator()
+        model_titles = ["Machine learning basics.", "machine Learning Basics", "Deep dive!"]
+        with patch.object(generator, '_generate_title_with_model', return_value=model_titles):
+            suggestions = generator.generate_title_suggestions(
+                content="Machine learning basics. " * 20,
+                num_suggestions=3
+            )
+        
+        self.assertEqual(suggestions[:2], ["Machine learning basics.", "Deep dive!"])
+        self.assertEqual(len(suggestions), 3)
+    
+    def test_preprocess_long_content_keeps_opening(self):
+        """Test that long posts are cut to a bounded prefix with whitespace collapsed"""
+        content = "Start   of\n\npost " + "filler " * 10000 + "end  of post"
+        processed = TitleGenerator()._preprocess_content(content)
+        
+        self.assertLessEqual(len(processed), title_generator._MAX_CONTENT_CHARS)
+        self.assertTrue(processed.startswith("Start of post filler"))
+        self.assertNotIn("end of post", processed)
+    
+    def test_extract_keywords_from_first_sentence(self):
+        """Test that keywords come from the first sentence, most frequent first"""
+        content = "... Neural networks learn; networks generalize. Cooking recipes are unrelated."
+        keywords = TitleGenerator()._extract_keywords(content, num_keywords=2)
+        self.assertEqual(keywords, ['networks', 'neural'])
+        
+        # A leading sentence without words yields no keywords, as before
+        self.assertEqual(TitleGenerator()._extract_keywords('--. AI rocks hard'), [])
+    
+    @patch('blog_title_suggestions.services.title_generator._cpu_supports_vnni', return_value=True)
+    @patch('blog_title_suggestions.services.title_generator.torch.cuda.is_available', return_value=False)
+    @patch('blog_title_suggestions.services.title_generator.torch.quantization.quantize_dynamic')
+    def test_quantize_on_cpu(self, mock_quantize, mock_cuda, mock_vnni):
+        """Test that Linear layers are quantized to INT8 on a VNNI CPU"""
+        model = MagicMock()
+        
+        self.assertIs(TitleGenerator()._quantize(model), mock_quantize.return_value)
+        mock_quantize.assert_called_once_with(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
+        # No quantization without VNNI
+        mock_vnni.return_value = False
+        self.assertIs(TitleGenerator()._quantize(model), model)
+    
+    @override_settings(TITLE_MODEL_NAME='t5-small')
+    def test_model_name_from_settings(self):
+        """Test that the model defaults to the TITLE_MODEL_NAME setting"""
+        self.assertEqual(TitleGenerator().model_name, 't5-small')
+        self.assertEqual(TitleGenerator(model_name='t5-base').model_name, 't5-base')
+    
+    def test_get_returns_shared_instance(self):
+        """Test that get() hands every caller the same generator"""
+        with patch.object(TitleGenerator, '_instance', None):
+            self.assertIs(TitleGenerator.get(), TitleGenerator.get())
 
 class TitleSuggestionAPIViewTests(TestCase):
     """Test cases for the title suggestion API views"""
@@ -78,7 +210,7 @@ class TitleSuggestionAPIViewTests(TestCase):
         """Test the title suggestion API view"""
         # Mock the generator and its generate_title_suggestions method
         mock_generator = MagicMock()
-        mock_generator_class.return_value = mock_generator
+        mock_generator_class.get.return_value = mock_generator
         mock_generator.generate_title_suggestions.return_value = [
             "Title Suggestion 1",
             "Title Suggestion 2",
@@ -100,7 +232,7 @@ class TitleSuggestionAPIViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         
         # Assert generator was called correctly
-        mock_generator_class.assert_called_once()
+        mock_generator_class.get.assert_called_once()
         mock_generator.generate_title_suggestions.assert_called_once_with(
             content=test_content,
             num_suggestions=3
@@ -112,6 +244,22 @@ class TitleSuggestionAPIViewTests(TestCase):
         self.assertEqual(len(response_data['titles']), 3)
         self.assertEqual(response_data['titles'][0], "Title Suggestion 1")
 
+    
+    @patch('blog_title_suggestions.views.TitleGenerator')
+    def test_title_suggestion_api_view_rejects_bad_input(self, mock_generator_class):
+        """Test that invalid input is rejected with a 400 before generation"""
+        url = reverse('title_suggestions')
+        valid_content = "This is a test blog post content with sufficient length to pass validation."
+        
+        for data in [
+            {'content': valid_content, 'num_suggestions': 'three'},
+            {'content': '   ' + 'x' * 40 + '          '},
+            {'content': 12345}
+        ]:
+            response = self.client.post(url, data, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        
+        mock_generator_class.get.assert_not_called()
 
 class BlogPostAPIViewTests(TestCase):
     """Test cases for the blog post API views"""
@@ -145,12 +293,39 @@ class BlogPostAPIViewTests(TestCase):
         self.assertEqual(blog_post.title, test_data['title'])
         self.assertEqual(blog_post.content, test_data['content'])
     
+    def test_list_blog_posts(self):
+        """Test the list view previews content in a single query"""
+        for content in ['Short content', 'y' * 250]:
+            BlogPost.objects.create(title='Post', content=content)
+        
+        url = reverse('blog_posts')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        previews = sorted(p['content_preview'] for p in response.json())
+        self.assertEqual(previews, ['Short content', 'y' * 200 + '...'])
+    
+    def test_blog_post_detail(self):
+        """Test the detail view returns the post and its suggestions in a single query"""
+        blog_post = BlogPost.objects.create(title='Post', content='Content')
+        TitleSuggestion.objects.create(blog_post=blog_post, content='Content', suggestions=['First'])
+        TitleSuggestion.objects.create(blog_post=blog_post, content='Content', suggestions=['Second'])
+        
+        url = reverse('blog_post_detail', args=[blog_post.id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title_suggestions'], ['First'])
+    
+    @patch('blog_title_suggestions.views._IO_POOL')
     @patch('blog_title_suggestions.views.TitleGenerator')
-    def test_create_blog_post_with_suggestions(self, mock_generator_class):
+    def test_create_blog_post_with_suggestions(self, mock_generator_class, mock_pool):
         """Test creating a blog post with title suggestions"""
         # Mock the generator and its generate_title_suggestions method
         mock_generator = MagicMock()
-        mock_generator_class.return_value = mock_generator
+        mock_generator_class.get.return_value = mock_generator
         mock_generator.generate_title_suggestions.return_value = [
             "Title Suggestion 1",
             "Title Suggestion 2",
@@ -180,4 +355,13 @@ class BlogPostAPIViewTests(TestCase):
         self.assertIn('id', response_data)
         self.assertEqual(response_data['title'], test_data['title'])
         self.assertIn('title_suggestions', response_data)
-        self.assertEqual(len(response_data['title_suggestions']), 3)
\ No newline at end of file
+        self.assertEqual(len(response_data['title_suggestions']), 3)
+        
+        # The suggestions are saved by a background thread
+        mock_pool.submit.assert_called_once()
+        self.assertFalse(TitleSuggestion.objects.exists())
+        with patch('blog_title_suggestions.views.connection'):
+            mock_pool.submit.call_args.args[0]()
+        suggestion = TitleSuggestion.objects.get()
+        self.assertEqual(suggestion.blog_post_id, response_data['id'])
+        self.assertEqual(suggestion.suggestions, mock_generator.generate_title_suggestions.return_value)
\ No newline at end of file
@@ -2,6 +2,10 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import connection
+from django.db.models import JSONField, OuterRef, Subquery
+from django.db.models.functions import Substr
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 from .models import BlogPost, TitleSuggestion
@@ -9,6 +13,22 @@ from .services.title_generator import TitleGenerator
 
 logger = logging.getLogger(__name__)
 
+# Suggestion history the response doesn't depend on is written off the request thread
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='title-suggestion-log')
+
+def _log_suggestions_in_background(**fields):
+    """Record a TitleSuggestion without holding up the response"""
+    def save():
+        try:
+            TitleSuggestion.objects.create(**fields)
+        except Exception as e:
+            logger.error(f"Error saving title suggestions: {str(e)}")
+        finally:
+            # Pool threads outlive the request, so release their connection
+            connection.close()
+    
+    _IO_POOL.submit(save)
+
 class TitleSuggestionAPIView(APIView):
     """
     API endpoint for generating blog post title suggestions
@@ -20,19 +40,28 @@ class TitleSuggestionAPIView(APIView):
         # Get content from request
         content = request.data.get('content')
         
-        if not content or len(content.strip()) < 50:
+        # Validate before any expensive work; only strip when surrounding
+        # whitespace could pull the content under the minimum
+        if (not isinstance(content, str) or len(content) < 50
+                or ((content[0].isspace() or content[-1].isspace()) and len(content.strip()) < 50)):
             return Response(
                 {"error": "Please provide blog content with at least 50 characters"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
+        
+        # Get number of suggestions from request or use default
         try:
-            # Get number of suggestions from request or use default
             num_suggestions = int(request.data.get('num_suggestions', 3))
-            num_suggestions = min(max(num_suggestions, 1), 5)  # Limit between 1 and 5
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "num_suggestions must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        num_suggestions = min(max(num_suggestions, 1), 5)  # Limit between 1 and 5
             
-            # Initialize the title generator
-            title_generator = TitleGenerator()
+        try:
+            # Shared generator; the model is loaded once per process
+            title_generator = TitleGenerator.get()
             
             # Generate title suggestions
             suggestions = title_generator.generate_title_suggestions(
@@ -65,13 +94,17 @@ class TitleSuggestionAPIView(APIView):
         """
         Get a list of previous title suggestions
         """
-        suggestions = TitleSuggestion.objects.all().order_by('-created_at')[:10]
+        # Project plain dicts and slice the content in SQL;
+        # one extra character tells us whether the preview was truncated
+        suggestions = TitleSuggestion.objects.order_by('-created_at').values(
+            'id', 'suggestions', 'created_at', content_head=Substr('content', 1, 101)
+        )[:10]
         
         response_data = [{
-            'id': s.id,
-            'titles': s.suggestions,
-            'created_at': s.created_at.isoformat(),
-            'content_preview': s.content[:100] + '...' if len(s.content) > 100 else s.content
+            'id': s['id'],
+            'titles': s['suggestions'],
+            'created_at': s['created_at'].isoformat(),
+            'content_preview': s['content_head'][:100] + '...' if len(s['content_head']) > 100 else s['content_head']
         } for s in suggestions]
         
         return Response(response_data, status=status.HTTP_200_OK)
@@ -106,11 +139,11 @@ class BlogPostAPIView(APIView):
             suggestions = []
             
             if generate_suggestions:
-                title_generator = TitleGenerator()
+                title_generator = TitleGenerator.get()
                 suggestions = title_generator.generate_title_suggestions(content=content)
                 
                 # Save suggestions
-                TitleSuggestion.objects.create(
+                _log_suggestions_in_background(
                     blog_post=blog_post,
                     content=content[:1000],
                     suggestions=suggestions
@@ -140,13 +173,16 @@ class BlogPostAPIView(APIView):
         """
         Get a list of blog posts
         """
-        blog_posts = BlogPost.objects.all().order_by('-created_at')[:10]
+        # Project plain dicts and slice the content in SQL
+        blog_posts = BlogPost.objects.order_by('-created_at').values(
+            'id', 'title', 'created_at', content_head=Substr('content', 1, 201)
+        )[:10]
         
         response_data = [{
-            'id': post.id,
-            'title': post.title,
-            'content_preview': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-            'created_at': post.created_at.isoformat()
+            'id': post['id'],
+            'title': post['title'],
+            'content_preview': post['content_head'][:200] + '...' if len(post['content_head']) > 200 else post['content_head'],
+            'created_at': post['created_at'].isoformat()
         } for post in blog_posts]
         
         return Response(response_data, status=status.HTTP_200_OK)
@@ -160,14 +196,19 @@ class BlogPostDetailAPIView(APIView):
         """
         Get a specific blog post by ID
         """
-        blog_post = get_object_or_404(BlogPost, id=post_id)
+        # Fetch the post and its first suggestion set in one query
+        first_suggestions = TitleSuggestion.objects.filter(
+            blog_post=OuterRef('pk')
+        ).order_by('pk').values('suggestions')[:1]
+        blog_post = get_object_or_404(
+            BlogPost.objects.annotate(
+                first_suggestions=Subquery(first_suggestions, output_field=JSONField())
+            ),
+            id=post_id
+        )
         
         # Get title suggestions if they exist
-        try:
-            title_suggestions = TitleSuggestion.objects.filter(blog_post=blog_post).first()
-            suggestions = title_suggestions.suggestions if title_suggestions else []
-        except Exception:
-            suggestions = []
+        suggestions = blog_post.first_suggestions or []
         
         response_data = {
             'id': blog_post.id,
@@ -202,11 +243,11 @@ class BlogPostDetailAPIView(APIView):
         suggestions = []
         
         if generate_suggestions and content:
-            title_generator = TitleGenerator()
+            title_generator = TitleGenerator.get()
             suggestions = title_generator.generate_title_suggestions(content=content)
             
             # Save new suggestions
-            TitleSuggestion.objects.create(
+            _log_suggestions_in_background(
                 blog_post=blog_post,
                 content=content[:1000],
                 suggestions=suggestions
@@ -0,0 +1,14 @@
+import os
+
+from celery import Celery
+
+# Set the default Django settings module for the 'celery' program.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'darwix_ai_project.settings')
+
+app = Celery('darwix_ai_project')
+
+# Read CELERY_* keys from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load tasks.py from all installed apps
+app.autodiscover_tasks()
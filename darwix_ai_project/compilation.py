@@ -0,0 +1,17 @@
+"""
+torch.compile wrapper shared by the transcription and title generation services.
+
+Import it only where a model is compiled; it pulls in torch._dynamo.
+"""
+
+import torch
+import torch._dynamo
+
+# Fall back to eager execution if a graph fails to compile on first use. This is
+# process-wide Dynamo state, so it is set here once rather than by each service
+torch._dynamo.config.suppress_errors = True
+
+
+def compile_forward(model, **options):
+    """Replace the module's forward with a torch.compile'd version"""
+    model.forward = torch.compile(model.forward, **options)
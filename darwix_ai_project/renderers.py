@@ -0,0 +1,23 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer backed by orjson, which also serializes NumPy arrays natively"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    
+    # Fall back to DRF's encoder for lazy strings, Decimals, querysets, etc.
+    _default = JSONEncoder().default
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        return orjson.dumps(
+            data,
+            default=self._default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
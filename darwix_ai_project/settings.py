@@ -105,12 +105,49 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Temp directory for audio file processing
-TEMP_DIR = os.path.join(BASE_DIR, 'temp')
+# Temp directory for audio file processing; prefer tmpfs so converted WAVs never hit the disk
+TEMP_DIR = os.getenv(
+    'TEMP_DIR',
+    '/dev/shm/darwix' if os.path.isdir('/dev/shm') else os.path.join(BASE_DIR, 'temp')
+)
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Cache directory for diarization results, keyed by audio content hash
+DIAR_CACHE_DIR = os.getenv('DIAR_CACHE_DIR', os.path.join(Path.home(), '.cache', 'dexter', 'diarization'))
+os.makedirs(DIAR_CACHE_DIR, exist_ok=True)
+
+# Title generation model; small instruction-tuned T5 is plenty for short titles
+TITLE_MODEL_NAME = os.getenv('TITLE_MODEL_NAME', 'google/flan-t5-small')
+
+# Load the title generation model when a gunicorn worker starts (see gunicorn.conf.py)
+# instead of on the first request
+TITLE_MODEL_PRELOAD = os.getenv('TITLE_MODEL_PRELOAD', 'False') == 'True'
+
+# Title generation runtime: 'torch' (eager PyTorch) or 'onnx' (ONNX Runtime, faster on CPU)
+TITLE_MODEL_BACKEND = os.getenv('TITLE_MODEL_BACKEND', 'torch')
+TITLE_ONNX_DIR = os.getenv('TITLE_ONNX_DIR', os.path.join(Path.home(), '.cache', 'dexter', 'title_onnx'))
+os.makedirs(TITLE_ONNX_DIR, exist_ok=True)
+
+# Dynamic INT8 quantization of the PyTorch title model on VNNI-capable CPUs
+TITLE_MODEL_QUANTIZE = os.getenv('TITLE_MODEL_QUANTIZE', 'True') == 'True'
+
+# torch.compile the PyTorch title model's decoding step. Off by default: the first
+# generation pays a full Inductor compile, so pair it with TITLE_MODEL_PRELOAD
+TITLE_MODEL_COMPILE = os.getenv('TITLE_MODEL_COMPILE', 'False') == 'True'
+
+# Celery settings (background transcription jobs)
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_TASK_IGNORE_RESULT = True  # Job state lives on the Transcription row
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Jobs are long; don't hoard them on one worker
+
 # REST Framework settings
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'darwix_ai_project.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
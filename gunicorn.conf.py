@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for darwix_ai_project.
+
+Start the server with ``gunicorn -c gunicorn.conf.py darwix_ai_project.wsgi:application``.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def post_worker_init(worker):
+    """Prewarm the title model in each server worker when TITLE_MODEL_PRELOAD is set"""
+    # Only server workers run this hook, so migrate and other management commands
+    # never load the model. Warm up in the background: ONNX export can outlast the
+    # worker timeout, and requests arriving meanwhile wait on the model's load lock.
+    from django.conf import settings
+    
+    if not settings.TITLE_MODEL_PRELOAD:
+        return
+    
+    from blog_title_suggestions.services.title_generator import TitleGenerator
+    
+    def prewarm():
+        try:
+            TitleGenerator.get().prewarm()
+        except Exception as e:
+            logger.error(f"Error prewarming title generation model: {e}")
+    
+    threading.Thread(target=prewarm, name='title-model-prewarm', daemon=True).start()